@@ -0,0 +1,531 @@
+"""Micro-benchmarks for the faucet hot path
+
+Requires the tester extra: ``pip install -e .[bench]``
+
+    python benchmarks/bench_faucet.py --save benchmarks/baseline.json
+    python benchmarks/bench_faucet.py --compare benchmarks/baseline.json
+
+The transaction builders are first checked to produce the same transactions
+as web3's contract encoding, the pooled RPC provider is checked against stub
+JSON-RPC servers, the rate limiter is checked to keep its limits through
+reservations, and batch mode is run end to end against the batch disperser
+deployed on an in-process chain.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+from typing import Callable, Dict, List
+
+import requests
+from eth_tester import EthereumTester
+from hexbytes import HexBytes
+from web3 import EthereumTesterProvider, Web3
+from web3.contract import Contract
+from web3.types import RPCEndpoint
+
+from social_faucet import settings
+from social_faucet.cache import CachedStorage
+from social_faucet.faucet import load_abi
+from social_faucet.faucet_executor import FaucetExecutor, extract_address
+from social_faucet.fee_oracle import FeeOracle
+from social_faucet.provider import PooledHTTPProvider
+from social_faucet.rate_limiter import RateLimiter
+from social_faucet.receipt_tracker import ReceiptTracker
+from social_faucet.storage import DbmStorage, SQLiteStorage
+from social_faucet.transaction_builder import (
+    DisperseTransactionBuilder,
+    MintAsOwnerTransactionBuilder,
+    SendETHTransactionBuilder,
+)
+from social_faucet.types import Message, Status
+from social_faucet.validation import KeywordsValidator, RetweetValidator
+
+ADDRESS = Web3.toChecksumAddress("0x" + "ab12" * 10)
+CONTRACT_ADDRESS = Web3.toChecksumAddress("0x" + "cd34" * 10)
+RECEIVERS = [
+    ADDRESS,
+    Web3.toChecksumAddress("0x" + "00" * 19 + "01"),
+    Web3.toChecksumAddress("0x" + "ff" * 20),
+]
+TX_FIELDS = ["to", "data", "gas", "value"]
+MOCK_META_FAUCET_PATH = path.join(
+    path.dirname(__file__), "contracts", "mock-meta-faucet.json"
+)
+TWEET = (
+    "Testing the #GyrosoftWeatherSimulator by @GyroStable on Kovan, "
+    f"send to {ADDRESS} please"
+)
+
+
+def measure(name: str, func: Callable[[int], None], iterations: int) -> dict:
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    result = {
+        "iterations": iterations,
+        "ops_per_sec": iterations / total if total else float("inf"),
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+    }
+    print(
+        f"{name:<40} {result['ops_per_sec']:>12,.0f} ops/s "
+        f"p50 {result['p50_us']:>10,.1f}us p99 {result['p99_us']:>10,.1f}us"
+    )
+    return result
+
+
+def bench_parsing(iterations: int) -> Dict[str, dict]:
+    message = Message(source="twitter", id="1", user_id="1", text=TWEET)
+    keywords_validator = KeywordsValidator(settings.TWEET_TEXTS)
+    retweet_validator = RetweetValidator()
+    return {
+        "extract_address": measure(
+            "extract_address", lambda _: extract_address(TWEET), iterations
+        ),
+        "keywords_validator": measure(
+            "KeywordsValidator.validate",
+            lambda _: keywords_validator.validate(message),
+            iterations,
+        ),
+        "retweet_validator": measure(
+            "RetweetValidator.validate",
+            lambda _: retweet_validator.validate(message),
+            iterations,
+        ),
+    }
+
+
+def create_web3() -> Web3:
+    return Web3(EthereumTesterProvider(EthereumTester()))
+
+
+def check_transaction_builders(web3: Web3):
+    meta_faucet = web3.eth.contract(
+        abi=load_abi("meta-faucet.json"), address=CONTRACT_ADDRESS
+    )
+    disperser = web3.eth.contract(
+        abi=load_abi("batch-disperser.json"), address=CONTRACT_ADDRESS
+    )
+    send_eth_builder = SendETHTransactionBuilder()
+    mint_builder = MintAsOwnerTransactionBuilder(meta_faucet, gas=100_000)
+    disperse_builder = DisperseTransactionBuilder(disperser)
+
+    mismatches = []
+    for receiver in RECEIVERS:
+        expected = {"to": receiver, "value": settings.SEND_VALUE, "gas": 25000}
+        if send_eth_builder.build_transaction(receiver) != expected:
+            mismatches.append(f"SendETHTransactionBuilder({receiver})")
+        expected = meta_faucet.functions.mintAllAsOwner(dst=receiver).buildTransaction(
+            {"gas": 100_000, "gasPrice": 0}
+        )
+        actual = mint_builder.build_transaction(receiver)
+        if any(actual[key] != expected[key] for key in TX_FIELDS):
+            mismatches.append(f"MintAsOwnerTransactionBuilder({receiver})")
+    for count in range(len(RECEIVERS) + 1):
+        receivers = RECEIVERS[:count]
+        expected = disperser.functions.disperse(
+            receivers, settings.SEND_VALUE
+        ).buildTransaction(
+            {
+                "gas": disperse_builder.gas + disperse_builder.gas_per_receiver * count,
+                "gasPrice": 0,
+                "value": settings.SEND_VALUE * count,
+            }
+        )
+        actual = disperse_builder.build_batch_transaction(receivers)
+        if any(actual[key] != expected[key] for key in TX_FIELDS):
+            mismatches.append(f"DisperseTransactionBuilder({count} receivers)")
+    if mismatches:
+        raise AssertionError(f"builders differ from web3: {', '.join(mismatches)}")
+
+
+def check_batch_mode(directory: str):
+    web3 = create_web3()
+    private_key = web3.provider.ethereum_tester.backend.account_keys[0]  # type: ignore
+    owner = web3.eth.accounts[0]
+    receivers = [Web3.toChecksumAddress(f"0x{i + 0x20000:040x}") for i in range(4)]
+    blocked = receivers[-1]
+
+    with open(MOCK_META_FAUCET_PATH) as f:
+        artifact = json.load(f)
+    meta_faucet = deploy_contract(
+        web3, owner, artifact["abi"], artifact["bytecode"], blocked
+    )
+    with open(path.join(settings.DATA_PATH, "batch-disperser.bin")) as f:
+        bytecode = f.read().strip()
+    disperser = deploy_contract(
+        web3, owner, load_abi("batch-disperser.json"), bytecode, meta_faucet.address
+    )
+    meta_faucet.functions.transferOwnership(disperser.address).transact({"from": owner})
+
+    executor = FaucetExecutor(
+        web3,
+        RateLimiter(SQLiteStorage(path.join(directory, "batch.sqlite"))),
+        transaction_builders=[],
+        private_key=private_key.to_hex(),
+        receipt_tracker=ReceiptTracker(web3, poll_interval=0.001),
+        batch_transaction_builder=DisperseTransactionBuilder(disperser, owner=owner),
+        fee_oracle=FeeOracle(web3),
+    )
+    statuses: Dict[str, Status] = {}
+    done = threading.Semaphore(0)
+
+    def on_result(receiver, result):
+        statuses[receiver] = result.status
+        done.release()
+
+    for receiver in receivers:
+        executor.send_transactions(
+            receiver, callback=functools.partial(on_result, receiver)
+        )
+    for _ in receivers:
+        if not done.acquire(timeout=settings.BATCH_WINDOW + 30):
+            raise AssertionError("batch mode timed out")
+
+    errors = []
+    for receiver in receivers:
+        success = receiver != blocked
+        expected = Status.SUCCESS if success else Status.ERROR
+        balance = web3.eth.get_balance(receiver)
+        minted = meta_faucet.functions.minted(receiver).call()
+        if statuses[receiver] != expected:
+            errors.append(f"{receiver} is {statuses[receiver].name}")
+        if balance != (settings.SEND_VALUE if success else 0):
+            errors.append(f"{receiver} received {balance} wei")
+        if minted != int(success):
+            errors.append(f"{receiver} was minted {minted} times")
+    if web3.eth.get_balance(disperser.address) != 0:
+        errors.append("the disperser kept some ETH")
+    if errors:
+        raise AssertionError(f"batch mode failed: {', '.join(errors)}")
+
+
+def deploy_contract(
+    web3: Web3, owner: str, abi: list, bytecode: str, *args
+) -> Contract:
+    factory = web3.eth.contract(abi=abi, bytecode=bytecode)
+    tx_hash = factory.constructor(*args).transact({"from": owner})
+    receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+    return web3.eth.contract(abi=abi, address=receipt["contractAddress"])
+
+
+def bench_transaction_builders(iterations: int, web3: Web3) -> Dict[str, dict]:
+    meta_faucet = web3.eth.contract(
+        abi=load_abi("meta-faucet.json"), address=CONTRACT_ADDRESS
+    )
+    mint_builder = MintAsOwnerTransactionBuilder(meta_faucet, gas=100_000)
+    return {
+        "mint_as_owner_builder": measure(
+            "MintAsOwnerTransactionBuilder",
+            lambda _: mint_builder.build_transaction(ADDRESS),
+            iterations,
+        ),
+        "mint_as_owner_web3": measure(
+            "mintAllAsOwner.buildTransaction",
+            lambda _: meta_faucet.functions.mintAllAsOwner(
+                dst=ADDRESS
+            ).buildTransaction({"gas": 100_000, "gasPrice": 0}),
+            iterations,
+        ),
+    }
+
+
+def check_rate_limiter(directory: str):
+    backends = {
+        "sqlite": lambda: SQLiteStorage(path.join(directory, "check.sqlite")),
+        "cached_sqlite": lambda: CachedStorage(
+            SQLiteStorage(path.join(directory, "cached-check.sqlite"))
+        ),
+    }
+    errors = []
+    for name, create_storage in backends.items():
+        storage = create_storage()
+        rate_limiter = RateLimiter(storage)
+        now = int(time.time())
+
+        # a payout outliving its reservation, which was purged meanwhile
+        reservation = rate_limiter.try_reserve("1", "0x1")
+        storage.purge_expired(now + settings.RESERVATION_TIMEOUT + 1)
+        rate_limiter.commit(reservation)
+        if min(rate_limiter.get_user("1"), rate_limiter.get("0x1")) < now + 3600:
+            errors.append(f"expired reservation not committed [{name}]")
+
+        # an operator limit outlasting the rate limit, through a payout
+        rate_limiter.add(address="0x2", seconds=settings.RATE_LIMIT * 10)
+        ban = rate_limiter.get("0x2")
+        rate_limiter.release(rate_limiter.reserve(user_id="2", address="0x2"))
+        rate_limiter.commit(rate_limiter.reserve(user_id="3", address="0x2"))
+        if rate_limiter.get("0x2") != ban or rate_limiter.get_user("2") != 0:
+            errors.append(f"operator limit not kept [{name}]")
+        storage.close()
+    if errors:
+        raise AssertionError(f"rate limiter failed: {', '.join(errors)}")
+
+
+class StubRPCServer(ThreadingHTTPServer):
+    """JSON-RPC endpoint answering with ``status``, or with the first parameter
+    of every call, in reverse order for batches, and no receipts"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubRPCHandler)
+        self.status = 200
+        self.requests: List[object] = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StubRPCHandler(BaseHTTPRequestHandler):
+    server: StubRPCServer
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(payload)
+        if self.server.status != 200:
+            self.send_error(self.server.status)
+            return
+        if isinstance(payload, list):
+            response = [self.respond(call) for call in reversed(payload)]
+        else:
+            response = self.respond(payload)
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def respond(call: dict) -> dict:
+        result = call["params"][0] if call["params"] else None
+        if call["method"] == "eth_getTransactionReceipt":
+            result = None
+        return {"jsonrpc": "2.0", "id": call["id"], "result": result}
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def check_provider():
+    errors = []
+    server, failing, rejecting = StubRPCServer(), StubRPCServer(), StubRPCServer()
+    failing.status, rejecting.status = 503, 400
+
+    # concurrent calls are merged, and responses matched back by id
+    provider = PooledHTTPProvider([server.url], batch_size=50, batch_window=0.05)
+    results: Dict[int, object] = {}
+
+    def get_balance(i: int):
+        response = provider.make_request(
+            RPCEndpoint("eth_getBalance"), [f"0x{i:040x}", "latest"]
+        )
+        results[i] = response["result"]
+
+    threads = [threading.Thread(target=get_balance, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(server.requests) != 1 or len(server.requests[0]) != 20:  # type: ignore
+        errors.append(f"20 calls sent as {len(server.requests)} requests")
+    if any(results.get(i) != f"0x{i:040x}" for i in range(20)):
+        errors.append("batch responses not matched by id")
+
+    # receipt polls fill batch requests, from the second round on as the first
+    # one starts with the first tracked transaction
+    tracker = ReceiptTracker(
+        Web3(PooledHTTPProvider([server.url], batch_window=0.05)),
+        poll_interval=1,
+    )
+    for i in range(200):
+        tracker.track(HexBytes(i.to_bytes(32, "big")), lambda _: None)
+    time.sleep(0.5)
+    server.requests.clear()
+    time.sleep(1)
+    sizes = [len(request) for request in server.requests]  # type: ignore
+    if sum(sizes) != 200 or max(sizes) != settings.RPC_BATCH_SIZE:
+        errors.append(f"200 receipt polls sent in batches of {sizes}")
+
+    # a failing endpoint is skipped until its cooldown ends
+    server.requests.clear()
+    provider = PooledHTTPProvider([failing.url, server.url], cooldown=0.5)
+    for i in range(3):
+        provider.make_request(RPCEndpoint("eth_sendRawTransaction"), [f"0x{i:02x}"])
+    if len(failing.requests) != 1 or len(server.requests) != 3:
+        errors.append("failed endpoint not skipped")
+    time.sleep(0.5)
+    provider.make_request(RPCEndpoint("eth_sendRawTransaction"), ["0x03"])
+    if len(failing.requests) != 2:
+        errors.append("failed endpoint not retried after its cooldown")
+
+    # client errors are not retried on the next endpoint
+    server.requests.clear()
+    provider = PooledHTTPProvider([rejecting.url, server.url])
+    try:
+        provider.make_request(RPCEndpoint("eth_sendRawTransaction"), ["0x00"])
+        errors.append("client error not raised")
+    except requests.HTTPError:
+        pass
+    if server.requests:
+        errors.append("client error failed over")
+
+    for stub in (server, failing, rejecting):
+        stub.shutdown()
+    if errors:
+        raise AssertionError(f"provider failed: {', '.join(errors)}")
+
+
+def bench_rate_limiter(iterations: int, directory: str) -> Dict[str, dict]:
+    backends = {
+        "dbm": lambda: DbmStorage(path.join(directory, "rate-limits")),
+        "sqlite": lambda: SQLiteStorage(path.join(directory, "rate-limits.sqlite")),
+        "cached_sqlite": lambda: CachedStorage(
+            SQLiteStorage(path.join(directory, "cached-rate-limits.sqlite"))
+        ),
+    }
+    results = {}
+    for name, create_storage in backends.items():
+        storage = create_storage()
+        rate_limiter = RateLimiter(storage)
+        results[f"rate_limiter_add_{name}"] = measure(
+            f"RateLimiter.add [{name}]",
+            lambda i: rate_limiter.add(user_id=str(i), address=f"0x{i:040x}"),
+            iterations,
+        )
+        results[f"rate_limiter_get_{name}"] = measure(
+            f"RateLimiter.get [{name}]",
+            lambda i: rate_limiter.get(f"0x{i:040x}"),
+            iterations,
+        )
+        results[f"rate_limiter_is_rate_limited_{name}"] = measure(
+            f"RateLimiter.is_rate_limited [{name}]",
+            lambda i: rate_limiter.is_rate_limited(str(i * 2), f"0x{i * 2:040x}"),
+            iterations,
+        )
+        storage.close()
+    return results
+
+
+def create_executor(directory: str) -> FaucetExecutor:
+    web3 = create_web3()
+    private_key = web3.provider.ethereum_tester.backend.account_keys[0]  # type: ignore
+    rate_limiter = RateLimiter(
+        CachedStorage(SQLiteStorage(path.join(directory, "executor.sqlite")))
+    )
+    return FaucetExecutor(
+        web3,
+        rate_limiter,
+        transaction_builders=[SendETHTransactionBuilder()],
+        validators=[RetweetValidator(), KeywordsValidator(settings.TWEET_TEXTS)],
+        private_key=private_key.to_hex(),
+        receipt_tracker=ReceiptTracker(web3, poll_interval=0.001),
+        fee_oracle=FeeOracle(web3),
+    )
+
+
+def bench_executor(iterations: int, directory: str) -> Dict[str, dict]:
+    executor = create_executor(directory)
+    tx_builder = executor.transaction_builders[0]
+    signer = executor.wallet_pool.signers[0]
+
+    def create_and_sign(_):
+        transaction = executor.create_transaction(tx_builder, ADDRESS, signer)
+        signer.sign_transaction(transaction)
+        signer.nonce_manager.release(transaction["nonce"])
+
+    def process_message(i):
+        done = threading.Event()
+        text = TWEET.replace(ADDRESS, f"0x{i + 0x10000:040x}")
+        message = Message(source="twitter", id=str(i), user_id=str(i), text=text)
+        executor.process_message(message, callback=lambda _: done.set())
+        done.wait()
+
+    return {
+        "create_and_sign_transaction": measure(
+            "create_transaction + sign", create_and_sign, iterations
+        ),
+        "process_message": measure(
+            "FaucetExecutor.process_message", process_message, iterations
+        ),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]["ops_per_sec"]
+        if result["ops_per_sec"] < expected * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:,.0f} ops/s "
+                f"(baseline {expected:,.0f} ops/s)"
+            )
+    return regressions
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="bench_faucet")
+    parser.add_argument("-n", "--iterations", type=int, default=1000)
+    parser.add_argument(
+        "--e2e-iterations",
+        type=int,
+        default=100,
+        help="iterations for benchmarks hitting the in-process chain",
+    )
+    parser.add_argument("--save", help="path where to save results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare results to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed ops/sec drop relative to the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR, format=settings.LOG_FORMAT)
+
+    web3 = create_web3()
+    check_transaction_builders(web3)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        check_provider()
+        check_rate_limiter(directory)
+        check_batch_mode(directory)
+        results.update(bench_parsing(args.iterations))
+        results.update(bench_transaction_builders(args.iterations, web3))
+        results.update(bench_rate_limiter(args.iterations, directory))
+        results.update(bench_executor(args.e2e_iterations, directory))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
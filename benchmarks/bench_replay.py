@@ -0,0 +1,451 @@
+"""End-to-end load test replaying messages through stubbed Twitter and Discord clients
+
+Requires the tester extra: ``pip install -e .[bench]``
+
+    # replay a recording made with RECORD_PATH=messages.jsonl at 1x, 10x or max speed
+    python benchmarks/bench_replay.py messages.jsonl
+    python benchmarks/bench_replay.py messages.jsonl --speed 10
+    python benchmarks/bench_replay.py messages.jsonl --speed 0
+    # synthetic spike: 2000 messages at 200 msg/s, 5% redelivered
+    python benchmarks/bench_replay.py --synthetic 2000 --rate 200 --duplicates 0.05
+    # against a local dev chain instead of eth-tester
+    python benchmarks/bench_replay.py --synthetic 500 \\
+        --rpc-url http://localhost:8545 --private-key 0x...
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from os import path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from eth_tester import EthereumTester
+from hexbytes import HexBytes
+from web3 import EthereumTesterProvider, HTTPProvider, Web3
+from web3.types import RPCEndpoint
+
+from social_faucet import settings
+from social_faucet.cache import CachedStorage
+from social_faucet.dedup import InFlightPayouts, RecentMessages
+from social_faucet.discord_bot import FaucetDiscordClient
+from social_faucet.discord_dispatcher import DiscordDispatcher
+from social_faucet.faucet_executor import FaucetExecutor
+from social_faucet.fee_oracle import FeeOracle
+from social_faucet.journal import Journal
+from social_faucet.message_buffer import MessageBuffer
+from social_faucet.rate_limiter import RateLimiter
+from social_faucet.receipt_tracker import ReceiptTracker
+from social_faucet.recorder import load_recording
+from social_faucet.storage import SQLiteStorage
+from social_faucet.transaction_builder import SendETHTransactionBuilder
+from social_faucet.twitter import TwitterFaucetStreamListener
+from social_faucet.types import Message, Result
+from social_faucet.validation import KeywordsValidator, RetweetValidator
+from social_faucet.wallet import WalletPool
+
+SOURCES = ["twitter", "discord"]
+SAMPLE_INTERVAL = 0.1  # seconds
+FUTURE_NONCE_PATTERN = re.compile(r"Expected (\d+), but got (\d+)")
+
+
+class TxPoolEthereumTesterProvider(EthereumTesterProvider):
+    # NOTE: eth-tester is not thread-safe, and it rejects a nonce above the
+    # account's next one, so such transactions are held back until the gap
+    # is filled as they would be in a node's transaction pool
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._queued: List[str] = []
+
+    def make_request(self, method, params):
+        with self._lock:
+            if method != "eth_sendRawTransaction":
+                return super().make_request(method, params)
+            try:
+                response = super().make_request(method, params)
+            except Exception as ex:  # pylint: disable=broad-except
+                if not self._is_future_nonce(ex):
+                    raise
+                self._queued.append(params[0])
+                return {"result": Web3.keccak(HexBytes(params[0]))}
+            self._send_queued()
+            return response
+
+    def _send_queued(self):
+        sent = True
+        while sent:
+            sent = False
+            for raw_tx in list(self._queued):
+                try:
+                    super().make_request(
+                        RPCEndpoint("eth_sendRawTransaction"), [raw_tx]
+                    )
+                except Exception as ex:  # pylint: disable=broad-except
+                    if self._is_future_nonce(ex):
+                        continue
+                else:
+                    sent = True
+                self._queued.remove(raw_tx)
+
+    @staticmethod
+    def _is_future_nonce(ex: Exception) -> bool:
+        match = FUTURE_NONCE_PATTERN.search(str(ex))
+        return match is not None and int(match.group(2)) > int(match.group(1))
+
+
+def generate_messages(
+    count: int,
+    rate: float,
+    users: int,
+    duplicates: float,
+    sources: List[str],
+    seed: int,
+) -> List[Tuple[float, Message]]:
+    rng = random.Random(seed)
+    messages: List[Tuple[float, Message]] = []
+    now = 0.0
+    for i in range(count):
+        now += rng.expovariate(rate)
+        if messages and rng.random() < duplicates:
+            messages.append((now, messages[rng.randrange(len(messages))][1]))
+            continue
+        user = rng.randrange(users)
+        address = Web3.toChecksumAddress(f"0x{user + 0x100000:040x}")
+        text = f"{' '.join(settings.TWEET_TEXTS)} send to {address}"
+        messages.append((now, Message(rng.choice(sources), str(i), str(user), text)))
+    return messages
+
+
+class Tracker:
+    def __init__(self):
+        self.arrivals: Dict[Tuple[str, str], float] = {}
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = collections.Counter()
+        self.completed_at: List[float] = []
+        self._lock = threading.Lock()
+
+    def arrived(self, message: Message):
+        self.arrivals.setdefault((message.source, str(message.id)), time.perf_counter())
+
+    def trace(self, faucet_executor: FaucetExecutor):
+        process_message = faucet_executor.process_message
+
+        def traced(message: Message, callback=None, job_id=None):
+            def on_result(result: Result):
+                self.done(message, result)
+                if callback is not None:
+                    callback(result)
+
+            process_message(message, callback=on_result, job_id=job_id)
+
+        faucet_executor.process_message = traced  # type: ignore
+
+    def done(self, message: Message, result: Result):
+        now = time.perf_counter()
+        with self._lock:
+            arrival = self.arrivals.get((message.source, str(message.id)), now)
+            self.latencies.append(now - arrival)
+            self.statuses[result.status.name.lower()] += 1
+            self.completed_at.append(now)
+
+
+def create_web3(args) -> Tuple[Web3, List[str]]:
+    if args.rpc_url:
+        if not args.private_key:
+            raise SystemExit("--private-key is required with --rpc-url")
+        return Web3(HTTPProvider(args.rpc_url)), args.private_key
+    tester = EthereumTester()
+    web3 = Web3(TxPoolEthereumTesterProvider(tester))
+    keys = [key.to_hex() for key in tester.backend.account_keys]  # type: ignore
+    return web3, keys
+
+
+def create_executors(args, directory: str) -> Dict[str, FaucetExecutor]:
+    web3, private_keys = create_web3(args)
+    wallet_pool = WalletPool.from_private_keys(web3, private_keys[: args.shards])
+    wallet_pool.start()
+    journal = None
+    if args.journal:
+        journal = Journal(path.join(directory, "journal.jsonl"))
+        journal.start()
+    rate_limiter = RateLimiter(
+        CachedStorage(SQLiteStorage(path.join(directory, "rate-limits.sqlite")))
+    )
+    faucet_executor = FaucetExecutor(
+        web3,
+        rate_limiter,
+        transaction_builders=[SendETHTransactionBuilder()],
+        validators=[RetweetValidator(), KeywordsValidator(settings.TWEET_TEXTS)],
+        receipt_tracker=ReceiptTracker(web3, poll_interval=args.poll_interval),
+        fee_oracle=FeeOracle(web3),
+        wallet_pool=wallet_pool,
+        journal=journal,
+        recent_messages=None if args.no_dedup else RecentMessages(),
+        in_flight=None if args.no_dedup else InFlightPayouts(),
+    )
+    faucet_executor.source_executors["twitter"] = faucet_executor
+    return {
+        "twitter": faucet_executor,
+        "discord": faucet_executor.for_source("discord", [SendETHTransactionBuilder()]),
+    }
+
+
+def start_twitter(
+    faucet_executor: FaucetExecutor,
+) -> Tuple[Callable[[Message], None], Callable[[], int]]:
+    message_buffer = MessageBuffer(
+        "twitter", settings.TWITTER_BUFFER_SIZE, on_drop=faucet_executor.discard
+    )
+    listener = TwitterFaucetStreamListener(
+        faucet_executor, message_buffer=message_buffer
+    )
+
+    def feed(message: Message):
+        listener.on_status(
+            SimpleNamespace(
+                id=message.id,
+                author=SimpleNamespace(id_str=message.user_id),
+                text=message.text,
+                retweeted_status=message.extra.get("is_retweet") or None,
+            )
+        )
+
+    return feed, message_buffer.__len__
+
+
+async def add_reaction(_emoji: str):
+    pass
+
+
+def start_discord(
+    faucet_executor: FaucetExecutor,
+) -> Tuple[Callable[[Message], None], Callable[[], int]]:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    client = FaucetDiscordClient(
+        faucet_executor, loop=loop, dispatcher=DiscordDispatcher(tx_replies=False)
+    )
+    asyncio.run_coroutine_threadsafe(client.on_ready(), loop).result()
+    channel = SimpleNamespace(id=1, name="faucet")
+
+    def feed(message: Message):
+        discord_message = SimpleNamespace(
+            id=message.id,
+            channel=channel,
+            author=SimpleNamespace(id=message.user_id, mention=f"<@{message.user_id}>"),
+            content=message.text,
+            add_reaction=add_reaction,
+        )
+        asyncio.run_coroutine_threadsafe(client.on_message(discord_message), loop)
+
+    return feed, lambda: client.message_queue.qsize()  # type: ignore
+
+
+def replay(
+    messages: List[Tuple[float, Message]],
+    feeders: Dict[str, Callable[[Message], None]],
+    tracker: Tracker,
+    speed: float,
+) -> Tuple[float, int]:
+    fed = 0
+    first = messages[0][0] if messages else 0
+    start = time.perf_counter()
+    for timestamp, message in messages:
+        if speed > 0:
+            delay = start + (timestamp - first) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        feed = feeders.get(message.source)
+        if feed is None:
+            logging.warning("no client for source %s, skipping", message.source)
+            continue
+        tracker.arrived(message)
+        feed(message)
+        fed += 1
+    return time.perf_counter() - start, fed
+
+
+def sample_queues(
+    queues: Dict[str, Callable[[], int]],
+    samples: List[Tuple[float, Dict[str, int]]],
+    stopped: threading.Event,
+):
+    while not stopped.is_set():
+        samples.append((time.perf_counter(), {k: f() for k, f in queues.items()}))
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def wait_drained(
+    tracker: Tracker, queues: Dict[str, Callable[[], int]], timeout: float
+) -> bool:
+    deadline = time.perf_counter() + timeout
+    idle_since: Optional[float] = None
+    completed = -1
+    while time.perf_counter() < deadline:
+        busy = any(f() for f in queues.values())
+        if busy or len(tracker.latencies) != completed:
+            completed = len(tracker.latencies)
+            idle_since = None
+        elif idle_since is None:
+            idle_since = time.perf_counter()
+        elif time.perf_counter() - idle_since > 1:
+            return True
+        time.sleep(SAMPLE_INTERVAL)
+    return False
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def build_report(
+    tracker: Tracker,
+    fed: int,
+    feed_seconds: float,
+    start: float,
+    samples: List[Tuple[float, Dict[str, int]]],
+) -> dict:
+    latencies = sorted(tracker.latencies)
+    elapsed = (max(tracker.completed_at) if tracker.completed_at else start) - start
+    report: dict = {
+        "messages": fed,
+        "completed": len(latencies),
+        "dropped": fed - len(latencies),
+        "statuses": dict(tracker.statuses),
+        "feed_seconds": feed_seconds,
+        "elapsed_seconds": elapsed,
+        "payouts_per_sec": tracker.statuses["success"] / elapsed if elapsed else 0.0,
+        "latency_ms": {},
+        "queues": {},
+    }
+    if latencies:
+        report["latency_ms"] = {
+            "p50": statistics.median(latencies) * 1000,
+            "p90": percentile(latencies, 0.9) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000,
+        }
+    feed_samples = [values for t, values in samples if t - start <= feed_seconds]
+    for name in samples[0][1] if samples else []:
+        values = [sample[name] for _, sample in samples]
+        growth = 0.0
+        if len(feed_samples) > 1 and feed_seconds:
+            growth = (feed_samples[-1][name] - feed_samples[0][name]) / feed_seconds
+        report["queues"][name] = {
+            "max": max(values),
+            "end": values[-1],
+            "growth_per_sec": growth,
+        }
+    return report
+
+
+def print_report(report: dict):
+    statuses = ", ".join(f"{k} {v}" for k, v in sorted(report["statuses"].items()))
+    print(
+        f"messages {report['messages']} fed in {report['feed_seconds']:.1f}s, "
+        f"{report['completed']} completed in {report['elapsed_seconds']:.1f}s "
+        f"({statuses}), {report['dropped']} dropped"
+    )
+    print(f"payouts/s {report['payouts_per_sec']:.1f}")
+    if report["latency_ms"]:
+        print(
+            "latency   "
+            + " ".join(f"{k} {v:,.0f}ms" for k, v in report["latency_ms"].items())
+        )
+    for name, queue in report["queues"].items():
+        print(
+            f"queue {name:<10} max {queue['max']:>6} end {queue['end']:>6} "
+            f"growth {queue['growth_per_sec']:>8.1f}/s"
+        )
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="bench_replay")
+    parser.add_argument("recording", nargs="?", help="JSONL recording to replay")
+    parser.add_argument("--synthetic", type=int, help="number of messages to generate")
+    parser.add_argument("--rate", type=float, default=50, help="synthetic msg/s")
+    parser.add_argument("--users", type=int, help="synthetic distinct users")
+    parser.add_argument(
+        "--duplicates", type=float, default=0.0, help="synthetic redelivery ratio"
+    )
+    parser.add_argument("--sources", default=",".join(SOURCES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="replay speed relative to the recording, 0 feeds at max speed",
+    )
+    parser.add_argument("--rpc-url", help="local dev chain, eth-tester by default")
+    parser.add_argument("--private-key", action="append", default=[])
+    parser.add_argument("--shards", type=int, default=1, help="number of signers")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--journal", action="store_true")
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--drain-timeout", type=float, default=120)
+    parser.add_argument("--save", help="path where to save the report as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR, format=settings.LOG_FORMAT)
+
+    if args.recording:
+        messages = sorted(load_recording(args.recording), key=lambda item: item[0])
+    elif args.synthetic:
+        sources = args.sources.split(",")
+        users = args.users or args.synthetic
+        messages = generate_messages(
+            args.synthetic, args.rate, users, args.duplicates, sources, args.seed
+        )
+    else:
+        parser.error("a recording or --synthetic is required")
+
+    with tempfile.TemporaryDirectory() as directory:
+        executors = create_executors(args, directory)
+        tracker = Tracker()
+        for faucet_executor in executors.values():
+            tracker.trace(faucet_executor)
+        feed_twitter, twitter_size = start_twitter(executors["twitter"])
+        feed_discord, discord_size = start_discord(executors["discord"])
+        faucet_executor = executors["twitter"]
+        queues = {
+            "twitter": twitter_size,
+            "discord": discord_size,
+            "receipts": lambda: faucet_executor.receipt_tracker.pending_count,
+            "retries": lambda: faucet_executor.retry_scheduler.pending_count,
+        }
+
+        samples: List[Tuple[float, Dict[str, int]]] = []
+        stopped = threading.Event()
+        threading.Thread(
+            target=sample_queues, args=(queues, samples, stopped), daemon=True
+        ).start()
+        start = time.perf_counter()
+        feed_seconds, fed = replay(
+            messages,
+            {"twitter": feed_twitter, "discord": feed_discord},
+            tracker,
+            args.speed,
+        )
+        if not wait_drained(tracker, queues, args.drain_timeout):
+            logging.error("payouts did not drain in %ss", args.drain_timeout)
+        stopped.set()
+
+    report = build_report(tracker, fed, feed_seconds, start, samples)
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
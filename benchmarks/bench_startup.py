@@ -0,0 +1,82 @@
+"""Startup benchmark based on ``python -X importtime``
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --cli-budget-ms 100 --runner-budget-ms 1500
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+IMPORTTIME_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def import_times(module: str) -> Dict[str, Tuple[int, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            times[name] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module: str, repeat: int) -> Tuple[float, List[Tuple[str, int]]]:
+    runs = [import_times(module) for _ in range(repeat)]
+    total_ms = statistics.median(run[module][1] for run in runs) / 1000
+    slowest = sorted(
+        ((name, cumulative) for name, (_, cumulative) in runs[-1].items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return total_ms, slowest
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog="bench_startup")
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--cli-budget-ms",
+        type=float,
+        default=100,
+        help="import budget of social_faucet.cli, which is all `-h` loads",
+    )
+    parser.add_argument(
+        "--runner-budget-ms",
+        type=float,
+        default=1500,
+        help="import budget of social_faucet.runner, loaded by the run commands",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    budgets = {
+        "social_faucet.cli": args.cli_budget_ms,
+        "social_faucet.runner": args.runner_budget_ms,
+    }
+    over_budget = []
+    for module, budget in budgets.items():
+        total_ms, slowest = measure(module, args.repeat)
+        print(f"{module:<25} {total_ms:>8.1f}ms (budget {budget:.0f}ms)")
+        for name, cumulative in slowest[1 : args.top + 1]:
+            print(f"    {name:<40} {cumulative / 1000:>8.1f}ms")
+        if total_ms > budget:
+            over_budget.append(f"{module}: {total_ms:.1f}ms > {budget:.0f}ms")
+
+    for line in over_budget:
+        print(f"over budget: {line}", file=sys.stderr)
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,32 @@
+# @version 0.3.10
+# Stand-in for the meta faucet in the batch mode benchmark: counts the mints
+# of every address, and rejects `blocked` to exercise failed recipients.
+# Built with `vyper --evm-version paris -f abi,bytecode` into mock-meta-faucet.json.
+
+event OwnershipTransferred:
+    previousOwner: indexed(address)
+    newOwner: indexed(address)
+
+owner: public(address)
+blocked: public(address)
+minted: public(HashMap[address, uint256])
+
+
+@external
+def __init__(_blocked: address):
+    self.owner = msg.sender
+    self.blocked = _blocked
+
+
+@external
+def mintAllAsOwner(dst: address):
+    assert msg.sender == self.owner, "caller is not the owner"
+    assert dst != self.blocked, "blocked"
+    self.minted[dst] += 1
+
+
+@external
+def transferOwnership(newOwner: address):
+    assert msg.sender == self.owner, "caller is not the owner"
+    log OwnershipTransferred(self.owner, newOwner)
+    self.owner = newOwner
@@ -0,0 +1,59 @@
+# @version 0.3.10
+# Batch payouts for social-faucet: sends ETH and mints the meta faucet tokens
+# to every recipient in a single transaction.
+#
+# Only the owner (the deployer, which must be KOVAN_ADDRESS) can disperse.
+# The meta faucet's `mintAllAsOwner` is owner-only, so the meta faucet
+# ownership must be transferred to this contract, and can be handed back with
+# `transferMetaFaucetOwnership`.
+
+interface MetaFaucet:
+    def mintAllAsOwner(dst: address): nonpayable
+    def transferOwnership(newOwner: address): nonpayable
+
+event Dispersed:
+    recipient: indexed(address)
+    success: bool
+
+MAX_RECIPIENTS: constant(uint256) = 256
+# NOTE: enough for a plain transfer, not for the recipient to run code
+TRANSFER_GAS: constant(uint256) = 2300
+
+metaFaucet: public(address)
+owner: public(address)
+
+
+@external
+def __init__(_metaFaucet: address):
+    self.metaFaucet = _metaFaucet
+    self.owner = msg.sender
+
+
+@external
+@payable
+def disperse(recipients: DynArray[address, MAX_RECIPIENTS], amount: uint256):
+    assert msg.sender == self.owner, "only the owner can disperse"
+    assert msg.value == amount * len(recipients), "value does not match"
+
+    for recipient in recipients:
+        # a failed mint or transfer only fails its recipient
+        success: bool = raw_call(
+            self.metaFaucet,
+            _abi_encode(recipient, method_id=method_id("mintAllAsOwner(address)")),
+            revert_on_failure=False,
+        )
+        if success and amount > 0:
+            success = raw_call(
+                recipient, b"", value=amount, gas=TRANSFER_GAS, revert_on_failure=False
+            )
+        log Dispersed(recipient, success)
+
+    # the ETH of failed recipients goes back to the owner
+    if self.balance > 0:
+        send(msg.sender, self.balance)
+
+
+@external
+def transferMetaFaucetOwnership(newOwner: address):
+    assert msg.sender == self.owner, "only the owner can transfer the meta faucet"
+    MetaFaucet(self.metaFaucet).transferOwnership(newOwner)
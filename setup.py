@@ -5,5 +5,6 @@ setup(
     name="social-faucet",
     packages=find_packages(),
     install_requires=["tweepy", "python-dotenv", "web3", "discord", "flask"],
+    extras_require={"bench": ["web3[tester]"], "server": ["waitress"]},
     entry_points={"console_scripts": ["social-faucet=social_faucet.cli:run"]},
 )
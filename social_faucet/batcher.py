@@ -0,0 +1,53 @@
+import logging
+import threading
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
+from social_faucet import settings
+
+T = TypeVar("T")
+
+
+class Batcher(Generic[T]):
+    def __init__(
+        self,
+        flush: Callable[[List[T]], None],
+        max_size: int = settings.BATCH_SIZE,
+        window: float = settings.BATCH_WINDOW,
+    ):
+        self.flush = flush
+        self.max_size = max_size
+        self.window = window
+        self._items: List[T] = []
+        self._first_added_at = 0.0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, item: T):
+        with self._condition:
+            if not self._items:
+                self._first_added_at = time.time()
+            self._items.append(item)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._items:
+                    self._condition.wait()
+                while len(self._items) < self.max_size:
+                    remaining = self._first_added_at + self.window - time.time()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                items = self._items[: self.max_size]
+                self._items = self._items[self.max_size :]
+                self._first_added_at = time.time()
+
+            try:
+                self.flush(items)
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.error("failed to flush batch of %s: %s", len(items), ex)
@@ -0,0 +1,127 @@
+import hashlib
+import heapq
+import math
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from social_faucet import settings
+from social_faucet.storage import RateLimitStorage
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big")
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+
+class CachedStorage(RateLimitStorage):
+    def __init__(
+        self,
+        backend: RateLimitStorage,
+        max_entries: int = settings.RATE_LIMIT_CACHE_SIZE,
+        bloom_capacity: int = settings.RATE_LIMIT_BLOOM_CAPACITY,
+    ):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._entries: Dict[str, int] = {}
+        self._expiry_heap: List[Tuple[int, str]] = []
+        self._bloom = BloomFilter(bloom_capacity)
+        self._version = 0
+        self._lock = threading.Lock()
+
+        now = int(time.time())
+        for key, limit_until in backend.items():
+            self._bloom.add(key)
+            if limit_until > now:
+                self._cache(key, limit_until)
+
+    # NOTE: the backend is called outside the lock, so that its readers run
+    # concurrently. Every write bumps the version before and after it, and a
+    # value read from the backend is only cached if no write happened meanwhile
+    def get(self, key: str) -> int:
+        now = int(time.time())
+        with self._lock:
+            self._evict_expired(now)
+            limit_until = self._entries.get(key)
+            if limit_until is not None:
+                return limit_until
+            if key not in self._bloom:
+                return 0
+            version = self._version
+        limit_until = self.backend.get(key)
+        if limit_until > now:
+            with self._lock:
+                if self._version == version:
+                    self._cache(key, limit_until)
+        return limit_until
+
+    def set(self, key: str, limit_until: int):
+        with self._lock:
+            version = self._invalidate(key)
+            self._bloom.add(key)
+        self.backend.set(key, limit_until)
+        with self._lock:
+            unchanged = self._version == version
+            self._invalidate(key)
+            if unchanged and limit_until > int(time.time()):
+                self._cache(key, limit_until)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            self._invalidate(key)
+        deleted = self.backend.delete(key)
+        with self._lock:
+            self._invalidate(key)
+        return deleted
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return self.backend.items()
+
+    def purge_expired(self, now: int) -> int:
+        with self._lock:
+            self._evict_expired(now)
+        return self.backend.purge_expired(now)
+
+    def close(self):
+        self.backend.close()
+
+    def _cache(self, key: str, limit_until: int):
+        self._entries[key] = limit_until
+        heapq.heappush(self._expiry_heap, (limit_until, key))
+        while len(self._entries) > self.max_entries:
+            self._pop_heap()
+        if len(self._expiry_heap) > 2 * self.max_entries:
+            self._expiry_heap = [(v, k) for k, v in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _invalidate(self, key: str) -> int:
+        self._entries.pop(key, None)
+        self._version += 1
+        return self._version
+
+    def _evict_expired(self, now: int):
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            self._pop_heap()
+
+    def _pop_heap(self):
+        limit_until, key = heapq.heappop(self._expiry_heap)
+        if self._entries.get(key) == limit_until:
+            del self._entries[key]
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Optional
+
+from web3.main import Web3
+from web3.types import RPCEndpoint, RPCResponse
+
+from social_faucet import settings
+
+MakeRequest = Callable[[RPCEndpoint, Any], RPCResponse]
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        web3: Web3,
+        failure_threshold: int = settings.CIRCUIT_FAILURE_THRESHOLD,
+        latency_threshold: float = settings.CIRCUIT_LATENCY_THRESHOLD,
+        probe_interval: float = settings.CIRCUIT_PROBE_INTERVAL,
+    ):
+        self.web3 = web3
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.probe_interval = probe_interval
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == CircuitState.OPEN
+
+    def install(self):
+        self.web3.middleware_onion.add(self.middleware, "circuit_breaker")
+
+    def middleware(self, make_request: MakeRequest, _web3: Web3) -> MakeRequest:
+        def middleware(method: RPCEndpoint, params: Any) -> RPCResponse:
+            if self.is_open:
+                raise CircuitOpenError(f"RPC circuit is open: {self.last_error}")
+            start = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except Exception as ex:
+                self.record_failure(f"{method} failed: {ex}")
+                raise
+            latency = time.perf_counter() - start
+            if latency > self.latency_threshold:
+                self.record_failure(f"{method} took {latency:.1f}s")
+            else:
+                self.record_success()
+            return response
+
+        return middleware
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self.is_open or self.failures < self.failure_threshold:
+                return
+            self.state = CircuitState.OPEN
+            self.opened_at = time.time()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._probe, daemon=True)
+                self._thread.start()
+        logging.error(
+            "opened the RPC circuit after %s failures: %s", self.failures, error
+        )
+
+    def status(self) -> dict:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "opened_at": self.opened_at,
+            "last_error": self.last_error,
+        }
+
+    def _probe(self):
+        while True:
+            time.sleep(self.probe_interval)
+            start = time.perf_counter()
+            try:
+                response = self.web3.provider.make_request(
+                    RPCEndpoint("eth_blockNumber"), []
+                )
+                if "error" in response:
+                    raise ValueError(response["error"])
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.warning("RPC probe failed: %s", ex)
+                self.last_error = f"probe failed: {ex}"
+                continue
+            if time.perf_counter() - start > self.latency_threshold:
+                logging.warning("RPC probe was too slow")
+                continue
+            with self._lock:
+                self.state = CircuitState.CLOSED
+                self.failures = 0
+                self.opened_at = None
+            logging.info("closed the RPC circuit")
+            return
@@ -2,7 +2,13 @@ import argparse
 import logging
 import os
 
-from social_faucet import runner, settings
+from social_faucet import settings
+
+DB_HELP = (
+    "Rate limit DB path or URL (sqlite://PATH or dbm://PATH). "
+    "Paths without a .sqlite extension use PATH.sqlite and migrate "
+    "an existing dbm database at PATH"
+)
 
 parser = argparse.ArgumentParser(prog="social-faucet")
 
@@ -11,7 +17,7 @@ twitter_kovan_parser = subparsers.add_parser(
     "twitter-kovan", help="Runs Twitter Kovan Faucet sending ETH"
 )
 twitter_kovan_parser.add_argument("keywords", nargs="+")
-twitter_kovan_parser.add_argument("--db", required=True, help="Path to rate limit DB")
+twitter_kovan_parser.add_argument("--db", required=True, help=DB_HELP)
 twitter_kovan_parser.add_argument(
     "--control-port",
     type=int,
@@ -22,7 +28,7 @@ twitter_kovan_parser.add_argument(
 discord_kovan_parser = subparsers.add_parser(
     "discord-kovan-tokens", help="Runs Discord Kovan Faucet sending tokens"
 )
-discord_kovan_parser.add_argument("--db", required=True, help="Path to rate limit DB")
+discord_kovan_parser.add_argument("--db", required=True, help=DB_HELP)
 discord_kovan_parser.add_argument(
     "--control-port",
     type=int,
@@ -30,6 +36,22 @@ discord_kovan_parser.add_argument(
     help="HTTP port to use to control the process",
 )
 
+run_parser = subparsers.add_parser(
+    "run", help="Runs all the faucets listed in a JSON config in one process"
+)
+run_parser.add_argument(
+    "config",
+    help='JSON config, e.g. {"faucets": [{"type": "twitter-kovan", '
+    '"keywords": ["gyro"]}, {"type": "discord-kovan-tokens"}]}',
+)
+run_parser.add_argument("--db", required=True, help=DB_HELP)
+run_parser.add_argument(
+    "--control-port",
+    type=int,
+    required=True,
+    help="HTTP port to use to control the process",
+)
+
 
 def run():
     logging.basicConfig(level=logging.INFO, format=settings.LOG_FORMAT)
@@ -38,6 +60,8 @@ def run():
     if not args.command:
         parser.error("no command provided")
 
+    from social_faucet import runner
+
     rate_limit_exclusions = None
     if settings.RATE_LIMIT_EXCLUSIONS:
         rate_limit_exclusions = [
@@ -52,6 +76,10 @@ def run():
         runner.run_discord_tokens_kovan_faucet(
             args.db, args.control_port, rate_limit_exclusions
         )
+    elif args.command == "run":
+        runner.run_configured_kovan_faucets(
+            args.config, args.db, args.control_port, rate_limit_exclusions
+        )
 
 
 if __name__ == "__main__":
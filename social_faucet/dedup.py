@@ -0,0 +1,97 @@
+import collections
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from social_faucet import settings
+from social_faucet.types import Message
+
+
+class RecentMessages:
+    def __init__(
+        self,
+        capacity: int = settings.DEDUP_MESSAGE_CAPACITY,
+        ttl: float = settings.DEDUP_MESSAGE_TTL,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        # NOTE: entries are kept in insertion order, which is also expiry order
+        self._expiry: "collections.OrderedDict[Tuple[str, str], float]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def add(self, message: Message) -> bool:
+        key = (message.source, str(message.id))
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if key in self._expiry:
+                return False
+            if len(self._expiry) >= self.capacity:
+                self._expiry.popitem(last=False)
+            self._expiry[key] = now + self.ttl
+            return True
+
+    def _evict(self, now: float):
+        while self._expiry and next(iter(self._expiry.values())) <= now:
+            self._expiry.popitem(last=False)
+
+
+class InFlightPayouts:
+    def __init__(
+        self,
+        capacity: int = settings.IN_FLIGHT_CAPACITY,
+        ttl: float = settings.RESERVATION_TIMEOUT,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._owners: Dict[str, str] = {}
+        self._jobs: "collections.OrderedDict[str, Tuple[float, List[str]]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def acquire(
+        self, job_id: str, user_id: Optional[str], address: Optional[str]
+    ) -> Optional[str]:
+        keys = []
+        if user_id:
+            keys.append(f"user_id:{user_id}")
+        if address:
+            keys.append(f"address:{address.lower()}")
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            if job_id in self._jobs:
+                return job_id
+            for key in keys:
+                owner = self._owners.get(key)
+                if owner is not None:
+                    return owner
+            if len(self._jobs) >= self.capacity:
+                self._remove(next(iter(self._jobs)))
+            self._jobs[job_id] = (now + self.ttl, keys)
+            for key in keys:
+                self._owners[key] = job_id
+            return None
+
+    def release(self, job_id: str):
+        with self._lock:
+            self._remove(job_id)
+
+    def _remove(self, job_id: str):
+        _, keys = self._jobs.pop(job_id, (0, []))
+        for key in keys:
+            if self._owners.get(key) == job_id:
+                del self._owners[key]
+
+    def _evict(self, now: float):
+        while self._jobs and next(iter(self._jobs.values()))[0] <= now:
+            self._remove(next(iter(self._jobs)))
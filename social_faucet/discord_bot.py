@@ -1,14 +1,15 @@
-import time
 import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Set
-import threading
 
 import discord
 from discord.message import Message as DiscordMessage
 
+from social_faucet import metrics, settings
+from social_faucet.discord_dispatcher import DiscordDispatcher
 from social_faucet.faucet_executor import FaucetExecutor
-from social_faucet.types import Message, Status
+from social_faucet.types import Message, Result, Status
 
 EMOJIS = {
     Status.SUCCESS: "👍",
@@ -16,66 +17,92 @@ EMOJIS = {
     Status.INVALID: "🤷‍♀️",
     Status.ERROR: "🚧",
 }
+BUSY_EMOJI = "⏳"
 
 
 class FaucetDiscordClient(discord.Client):
     def __init__(
-        self, faucet_executor: FaucetExecutor, channels: Optional[Set[str]] = None
+        self,
+        faucet_executor: FaucetExecutor,
+        channels: Optional[Set[str]] = None,
+        workers: int = settings.DISCORD_WORKERS,
+        queue_size: int = settings.DISCORD_QUEUE_SIZE,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        dispatcher: Optional[DiscordDispatcher] = None,
     ):
-        super().__init__()
+        super().__init__(loop=loop)
+        if dispatcher is None:
+            dispatcher = DiscordDispatcher()
+        self.dispatcher = dispatcher
         self.channels = channels
         self.faucet_executor = faucet_executor
-        self.message_queue = []
-        self._message_queue_lock = threading.Lock()
-        self._messages_processed = []
-        self._messages_processed_lock = threading.Lock()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.message_queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers)
 
     async def on_ready(self):
         logging.info(f"logged in discord as {self.user}")
-        loop = asyncio.get_event_loop()
-        asyncio.ensure_future(loop.run_in_executor(None, self.process_queue))
-        asyncio.create_task(self.finalize_processed())
+        if self.message_queue is not None:
+            return
+        self.dispatcher.start()
+        self.message_queue = asyncio.Queue(maxsize=self.queue_size)
+        metrics.QUEUE_DEPTH.set_function(self.message_queue.qsize, queue="discord")
+        for _ in range(self.workers):
+            asyncio.create_task(self.process_queue())
 
     async def on_message(self, message: DiscordMessage):
+        if message.author == self.user:
+            return
         if self.channels is not None and message.channel.name not in self.channels:
             return
+        if self.message_queue is None:
+            return
 
-        with self._message_queue_lock:
-            self.message_queue.append(message)
-
-    async def finalize_processed(self):
-        while True:
-            if not self._messages_processed:
-                await asyncio.sleep(0.1)
-                continue
-            with self._messages_processed_lock:
-                message, emoji = self._messages_processed.pop(0)
-            try:
-                await message.add_reaction(emoji)
-            except Exception as ex:
-                logging.warning("failed to send reaction to %s: %s", message, ex)
+        metrics.MESSAGES_RECEIVED.inc(source="discord")
+        if self.message_queue.full():
+            logging.warning("message queue full, dropping %s", message.id)
+            self.dispatcher.add_reaction(message, BUSY_EMOJI)
+            return
+        job_id = self.faucet_executor.receive(self.to_faucet_message(message))
+        if job_id is None:
+            return
+        self.message_queue.put_nowait((message, job_id))
 
-    def process_queue(self):
+    async def process_queue(self):
+        assert self.message_queue is not None
+        loop = asyncio.get_event_loop()
         while True:
-            if not self.message_queue:
-                time.sleep(0.1)
-                continue
-
-            with self._message_queue_lock:
-                message = self.message_queue.pop(0)
+            message, job_id = await self.message_queue.get()
             try:
-                self.process_message(message)
+                await loop.run_in_executor(
+                    self._executor, self.process_message, message, job_id
+                )
             except Exception as ex:  # pylint: disable=broad-except
                 logging.warning("failed to process %s: %s", message, ex)
+            finally:
+                self.message_queue.task_done()
 
-    def process_message(self, message: DiscordMessage):
-        faucet_message = Message(
+    @staticmethod
+    def to_faucet_message(message: DiscordMessage) -> Message:
+        return Message(
             source="discord",
             id=str(message.id),
             user_id=message.author.id,  # type: ignore
             text=message.content,
         )
-        status = self.faucet_executor.process_message(faucet_message)
-        emoji = EMOJIS[status]
-        with self._messages_processed_lock:
-            self._messages_processed.append((message, emoji))
+
+    def process_message(self, message: DiscordMessage, job_id: Optional[str] = None):
+        self.faucet_executor.process_message(
+            self.to_faucet_message(message),
+            callback=lambda result: self.on_processed(message, result),
+            job_id=job_id,
+        )
+
+    def on_processed(self, message: DiscordMessage, result: Result):
+        self.loop.call_soon_threadsafe(self.dispatch_result, message, result)
+
+    def dispatch_result(self, message: DiscordMessage, result: Result):
+        self.dispatcher.add_reaction(message, EMOJIS[result.status])
+        if result.status == Status.SUCCESS:
+            self.dispatcher.add_tx_hashes(message, result.tx_hashes)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+from discord.abc import Messageable
+from discord.message import Message as DiscordMessage
+
+from social_faucet import settings
+
+Action = Callable[[], Awaitable]
+
+
+def get_retry_after(ex: discord.HTTPException) -> float:
+    try:
+        return float(ex.response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return 1.0
+
+
+class DiscordDispatcher:
+    def __init__(
+        self,
+        concurrency: int = settings.DISCORD_DISPATCH_CONCURRENCY,
+        retries: int = settings.DISCORD_DISPATCH_RETRIES,
+        tx_replies: bool = settings.DISCORD_TX_REPLIES,
+        reply_interval: float = settings.DISCORD_REPLY_INTERVAL,
+        tx_url: str = settings.EXPLORER_TX_URL,
+    ):
+        self.retries = retries
+        self.tx_replies = tx_replies
+        self.reply_interval = reply_interval
+        self.tx_url = tx_url
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._buckets: Dict[int, "asyncio.Queue[Tuple[str, Action]]"] = {}
+        self._successes: Dict[int, Tuple[Messageable, List[str]]] = {}
+        self._reply_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.tx_replies and self._reply_task is None:
+            self._reply_task = asyncio.ensure_future(self._send_replies())
+
+    def add_reaction(self, message: DiscordMessage, emoji: str):
+        self._schedule(
+            message.channel,  # type: ignore
+            f"reaction {emoji} to {message.id}",
+            lambda: message.add_reaction(emoji),
+        )
+
+    def add_tx_hashes(self, message: DiscordMessage, tx_hashes: List[str]):
+        if not self.tx_replies or not tx_hashes:
+            return
+        channel = message.channel
+        _, lines = self._successes.setdefault(channel.id, (channel, []))  # type: ignore
+        links = " ".join(f"<{self.tx_url.format(tx_hash)}>" for tx_hash in tx_hashes)
+        lines.append(f"{message.author.mention} {links}")
+
+    def _schedule(self, channel: Messageable, description: str, action: Action):
+        queue = self._buckets.get(channel.id)  # type: ignore
+        if queue is None:
+            queue = self._buckets[channel.id] = asyncio.Queue()  # type: ignore
+            asyncio.ensure_future(self._drain(queue))
+        queue.put_nowait((description, action))
+
+    async def _drain(self, queue: "asyncio.Queue[Tuple[str, Action]]"):
+        while True:
+            description, action = await queue.get()
+            await self._call(description, action)
+
+    async def _call(self, description: str, action: Action):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    await action()
+                return
+            except discord.HTTPException as ex:
+                if ex.status != 429 or attempt == self.retries:
+                    logging.warning("failed to send %s: %s", description, ex)
+                    return
+                retry_after = get_retry_after(ex)
+                logging.info(
+                    "rate limited sending %s for %ss", description, retry_after
+                )
+                await asyncio.sleep(retry_after)
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.warning("failed to send %s: %s", description, ex)
+                return
+
+    async def _send_replies(self):
+        while True:
+            await asyncio.sleep(self.reply_interval)
+            successes = self._successes
+            self._successes = {}
+            for channel, lines in successes.values():
+                for content in self._chunk(lines):
+                    self._schedule(
+                        channel, f"reply to {channel}", self._sender(channel, content)
+                    )
+
+    @staticmethod
+    def _sender(channel: Messageable, content: str) -> Action:
+        return lambda: channel.send(content)
+
+    @staticmethod
+    def _chunk(lines: List[str]) -> List[str]:
+        chunks: List[str] = []
+        current = ""
+        for line in lines:
+            if (
+                current
+                and len(current) + len(line) + 1 > settings.DISCORD_MESSAGE_LIMIT
+            ):
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append(current)
+        return chunks
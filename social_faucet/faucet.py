@@ -1,24 +1,29 @@
+import asyncio
+import functools
+import inspect
 import json
 from abc import ABC, abstractmethod
 from os import path
-from social_faucet.discord_bot import FaucetDiscordClient
-from typing import List, Optional, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple, Type
 
-import tweepy
+from web3.contract import Contract
 from web3.main import Web3
 
 from social_faucet import settings
 from social_faucet.faucet_executor import FaucetExecutor
 from social_faucet.transaction_builder import (
+    BatchTransactionBuilder,
+    DisperseTransactionBuilder,
     MintAsOwnerTransactionBuilder,
     SendETHTransactionBuilder,
     TransactionBuilder,
 )
-from social_faucet.twitter import TwitterFaucetStreamListener
 from social_faucet.validation import KeywordsValidator, RetweetValidator, Validator
 
 
 class Faucet(ABC):
+    source: str
+
     @abstractmethod
     def listen(self, faucet_executor: FaucetExecutor):
         pass
@@ -31,21 +36,57 @@ class Faucet(ABC):
     def create_validators(self) -> List[Validator]:
         pass
 
+    def create_batch_transaction_builder(
+        self, web3: Web3
+    ) -> Optional[BatchTransactionBuilder]:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def load_abi(filename: str) -> list:
+    with open(path.join(settings.DATA_PATH, filename)) as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=None)
+def load_contract(web3: Web3, filename: str, address: str) -> Contract:
+    return web3.eth.contract(abi=load_abi(filename), address=address)  # type: ignore
+
 
 class WithMintOwnerTxBuilder:
-    def __init__(self, address, gas, *args, **kwargs):
+    def __init__(
+        self,
+        address,
+        gas,
+        *args,
+        batch_disperser_address=settings.BATCH_DISPERSER_ADDRESS,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self.address = address
         self.gas = gas
+        self.batch_disperser_address = batch_disperser_address
 
     def create_mint_as_owner_transaction_builder(self, web3):
-        with open(path.join(settings.DATA_PATH, "meta-faucet.json")) as f:
-            abi = json.load(f)
-        contract = web3.eth.contract(abi=abi, address=self.address)  # type: ignore
-        return MintAsOwnerTransactionBuilder(contract=contract, gas=self.gas)
+        contract = load_contract(web3, "meta-faucet.json", self.address)
+        return MintAsOwnerTransactionBuilder(
+            contract=contract, gas=self.gas, owner=settings.KOVAN_ADDRESS
+        )
+
+    def create_batch_transaction_builder(self, web3):
+        if not self.batch_disperser_address:
+            return None
+        contract = load_contract(
+            web3, "batch-disperser.json", self.batch_disperser_address
+        )
+        return DisperseTransactionBuilder(
+            contract=contract, owner=settings.KOVAN_ADDRESS
+        )
 
 
 class TwitterKovanFaucet(WithMintOwnerTxBuilder, Faucet):
+    source = "twitter"
+
     def __init__(
         self,
         keywords: List[str],
@@ -65,12 +106,18 @@ class TwitterKovanFaucet(WithMintOwnerTxBuilder, Faucet):
         return [RetweetValidator(), KeywordsValidator(settings.TWEET_TEXTS)]
 
     def listen(self, faucet_executor: FaucetExecutor):
+        import tweepy
+
+        from social_faucet.twitter import TwitterFaucetStreamListener
+
         faucet_stream_listener = TwitterFaucetStreamListener(faucet_executor)
         auth = self._authenticate()
         stream = tweepy.Stream(auth=auth, listener=faucet_stream_listener)
         stream.filter(track=self.keywords)
 
     def _authenticate(self):
+        import tweepy
+
         auth = tweepy.OAuthHandler(
             settings.TWITTER_API_KEY, settings.TWITTER_SECRET_KEY
         )
@@ -80,6 +127,8 @@ class TwitterKovanFaucet(WithMintOwnerTxBuilder, Faucet):
 
 
 class DiscordMintTokensAsOwnerKovanFaucet(WithMintOwnerTxBuilder, Faucet):
+    source = "discord"
+
     def __init__(
         self,
         channels: Optional[List[str]] = settings.DISCORD_CHANNELS,
@@ -99,5 +148,28 @@ class DiscordMintTokensAsOwnerKovanFaucet(WithMintOwnerTxBuilder, Faucet):
         return []
 
     def listen(self, faucet_executor: FaucetExecutor):
-        client = FaucetDiscordClient(faucet_executor, channels=self.channels)
-        client.run(settings.DISCORD_BOT_TOKEN)
+        from social_faucet.discord_bot import FaucetDiscordClient
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        client = FaucetDiscordClient(faucet_executor, channels=self.channels, loop=loop)
+        loop.run_until_complete(client.start(settings.DISCORD_BOT_TOKEN))
+
+
+FAUCETS: Dict[str, Type[Faucet]] = {
+    "twitter-kovan": TwitterKovanFaucet,
+    "discord-kovan-tokens": DiscordMintTokensAsOwnerKovanFaucet,
+}
+
+
+def create_faucet(config: dict) -> Faucet:
+    config = dict(config)
+    faucet_type = config.pop("type", None)
+    if faucet_type not in FAUCETS:
+        raise ValueError(f"unknown faucet type {faucet_type}")
+    faucet_class = FAUCETS[faucet_type]
+    try:
+        inspect.signature(faucet_class).bind(**config)
+    except TypeError as ex:
+        raise ValueError(f"invalid {faucet_type} faucet config: {ex}") from ex
+    return faucet_class(**config)
@@ -1,23 +1,98 @@
+import copy
+import functools
 import logging
+import re
+import threading
 import time
-from typing import List, Optional
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import web3
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+from web3.types import TxReceipt
 
-from social_faucet import settings
-from social_faucet.rate_limiter import RateLimiter
-from social_faucet.transaction_builder import TransactionBuilder
-from social_faucet.types import Message, Status
+from social_faucet import metrics, settings
+from social_faucet.batcher import Batcher
+from social_faucet.circuit_breaker import CircuitBreaker
+from social_faucet.dedup import InFlightPayouts, RecentMessages
+from social_faucet.fee_oracle import FeeOracle
+from social_faucet.journal import Job, Journal, JobState
+from social_faucet.nonce_manager import (
+    NonceManager,
+    is_known_transaction_error,
+    is_timeout_error,
+)
+from social_faucet.rate_limiter import RateLimiter, Reservation
+from social_faucet.receipt_tracker import ReceiptCallback, ReceiptTracker
+from social_faucet.recorder import MessageRecorder
+from social_faucet.retry import (
+    DEFAULT_RETRY_POLICIES,
+    ErrorClass,
+    RetryPolicy,
+    RetryScheduler,
+    get_retry_delay,
+)
+from social_faucet.transaction_builder import (
+    BatchTransactionBuilder,
+    TransactionBuilder,
+)
+from social_faucet.types import Message, Result, ResultCallback, Status
 from social_faucet.validation import ValidationError, Validator
+from social_faucet.wallet import Signer, WalletPool
+
+
+ADDRESS_PATTERN = re.compile(
+    r"0x[0-9a-fA-F]{%d}(?![0-9a-fA-F])" % (settings.ADDRESS_LENGTH - 2)
+)
+
+
+@functools.lru_cache(maxsize=settings.CHECKSUM_CACHE_SIZE)
+def to_checksum_address(address: str) -> Optional[str]:
+    checksum_address = web3.Web3.toChecksumAddress(address)
+    is_mixed_case = address != address.lower() and address != address.upper()
+    if is_mixed_case and address != checksum_address:
+        return None
+    return checksum_address
 
 
 def extract_address(text):
-    try:
-        address_index = text.index("0x")
-        address = text[address_index : address_index + settings.ADDRESS_LENGTH]
-        return web3.Web3.toChecksumAddress(address)
-    except ValueError:
-        return False
+    for match in ADDRESS_PATTERN.finditer(text):
+        address = to_checksum_address(match.group())
+        if address:
+            return address
+    return False
+
+
+@dataclass
+class Payout:
+    address: str
+    reservation: Reservation
+    callback: Optional[ResultCallback]
+    tx_hashes: List[str] = field(default_factory=list)
+    pending: int = 0
+    done: bool = False
+    created_at: float = field(default_factory=time.time)
+    job_id: Optional[str] = None
+
+
+@dataclass
+class SentTransaction:
+    transaction: dict
+    tx_hash: HexBytes
+    signer: Signer
+    payouts: List[Payout] = field(default_factory=list)
+    index: Optional[int] = None
+    replacements: List[HexBytes] = field(default_factory=list)
+    sent_at: float = field(default_factory=time.time)
+
+    @property
+    def tx_hashes(self) -> List[HexBytes]:
+        return [self.tx_hash] + self.replacements
+
+
+SentCallback = Callable[[Optional[SentTransaction]], None]
 
 
 class FaucetExecutor:
@@ -28,6 +103,19 @@ class FaucetExecutor:
         transaction_builders: List[TransactionBuilder],
         validators: List[Validator] = None,
         private_key: Optional[str] = settings.KOVAN_PRIVATE_KEY,
+        nonce_manager: Optional[NonceManager] = None,
+        receipt_tracker: Optional[ReceiptTracker] = None,
+        batch_transaction_builder: Optional[BatchTransactionBuilder] = None,
+        fee_oracle: Optional[FeeOracle] = None,
+        wallet_pool: Optional[WalletPool] = None,
+        journal: Optional[Journal] = None,
+        retry_scheduler: Optional[RetryScheduler] = None,
+        retry_policies: Optional[Dict[ErrorClass, RetryPolicy]] = None,
+        max_fee_bumps: int = settings.MAX_FEE_BUMPS,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        recent_messages: Optional[RecentMessages] = None,
+        in_flight: Optional[InFlightPayouts] = None,
+        recorder: Optional[MessageRecorder] = None,
     ):
         super().__init__()
         if validators is None:
@@ -36,7 +124,76 @@ class FaucetExecutor:
         self.transaction_builders = transaction_builders
         self.rate_limiter = rate_limiter
         self.web3 = web3
-        self.private_key = private_key
+        self.chain_id = web3.eth.chain_id
+        if fee_oracle is None:
+            fee_oracle = FeeOracle(web3)
+            fee_oracle.start()
+        self.fee_oracle = fee_oracle
+        if wallet_pool is None:
+            assert private_key is not None, "a private key or wallet pool is required"
+            signer = Signer(web3, private_key, nonce_manager=nonce_manager)
+            wallet_pool = WalletPool(web3, [signer])
+            wallet_pool.start()
+        self.wallet_pool = wallet_pool
+        if receipt_tracker is None:
+            receipt_tracker = ReceiptTracker(web3)
+        self.receipt_tracker = receipt_tracker
+        if retry_scheduler is None:
+            retry_scheduler = RetryScheduler()
+        self.retry_scheduler = retry_scheduler
+        if retry_policies is None:
+            retry_policies = DEFAULT_RETRY_POLICIES
+        self.retry_policies = retry_policies
+        self.max_fee_bumps = max_fee_bumps
+        self.circuit_breaker = circuit_breaker
+        self.recent_messages = recent_messages
+        self.in_flight = in_flight
+        self.recorder = recorder
+        self._payouts_lock = threading.Lock()
+        self.journal = journal
+        self.source_executors: Dict[str, "FaucetExecutor"] = {}
+        self.batch_transaction_builder = batch_transaction_builder
+        self.batcher: Optional[Batcher[Payout]] = None
+        if batch_transaction_builder is not None:
+            self.batcher = Batcher(self._send_batch)
+        self._check_signers()
+        metrics.IN_FLIGHT_TRANSACTIONS.set_function(
+            lambda: self.receipt_tracker.pending_count
+        )
+        metrics.QUEUE_DEPTH.set_function(
+            lambda: self.retry_scheduler.pending_count, queue="retry"
+        )
+        if circuit_breaker is not None:
+            metrics.RPC_CIRCUIT_OPEN.set_function(lambda: int(circuit_breaker.is_open))
+
+    def for_source(
+        self,
+        source: str,
+        transaction_builders: List[TransactionBuilder],
+        validators: List[Validator] = None,
+        batch_transaction_builder: Optional[BatchTransactionBuilder] = None,
+    ) -> "FaucetExecutor":
+        executor = copy.copy(self)
+        executor.transaction_builders = transaction_builders
+        executor.validators = validators if validators is not None else []
+        executor.batch_transaction_builder = batch_transaction_builder
+        executor.batcher = None
+        if batch_transaction_builder is not None:
+            executor.batcher = Batcher(executor._send_batch)
+        executor._check_signers()
+        self.source_executors[source] = executor
+        return executor
+
+    def _check_signers(self):
+        builders: List[Union[TransactionBuilder, BatchTransactionBuilder]] = list(
+            self.transaction_builders
+        )
+        if self.batch_transaction_builder is not None:
+            builders.append(self.batch_transaction_builder)
+        for builder in builders:
+            if builder.signer_address is not None:
+                # raises a ValueError if the pool has no such signer
+                self.wallet_pool.get(builder.signer_address)
 
     def log_issue(self, message: Message, error: str):
         logging.warning(
@@ -49,97 +206,656 @@ class FaucetExecutor:
 
     def run_validators(self, message: Message) -> bool:
         try:
-            for validator in self.validators:
-                validator.validate(message)
+            with metrics.STAGE_LATENCY.time(stage="validation"):
+                for validator in self.validators:
+                    validator.validate(message)
             return True
         except ValidationError as ex:
             self.log_issue(message, f"invalid: {ex}")
             return False
 
-    def create_transaction(self, tx_builder: TransactionBuilder, address: str) -> dict:
-        nonce = self.web3.eth.get_transaction_count(settings.KOVAN_ADDRESS)
-        transaction = tx_builder.build_transaction(address)
+    def create_transaction(
+        self, tx_builder: TransactionBuilder, address: str, signer: Signer
+    ) -> dict:
+        return self._fill_transaction(tx_builder.build_transaction(address), signer)
+
+    def create_batch_transaction(self, addresses: List[str], signer: Signer) -> dict:
+        assert self.batch_transaction_builder is not None
+        transaction = self.batch_transaction_builder.build_batch_transaction(addresses)
+        return self._fill_transaction(transaction, signer)
+
+    def _fill_transaction(self, transaction: dict, signer: Signer) -> dict:
         if transaction.get("gasPrice") == 0:
             transaction.pop("gasPrice", None)
+        max_fee_per_gas, max_priority_fee_per_gas = self.fee_oracle.get_fees()
         transaction.update(
             {
-                "chainId": self.web3.eth.chain_id,
-                "nonce": nonce,
-                "maxFeePerGas": self.web3.toWei(settings.GAS_PRICE, "gwei"),
-                "maxPriorityFeePerGas": self.web3.toWei(
-                    settings.MAX_PRIORITY_FEE_PER_GAS, "gwei"
-                ),
+                "chainId": self.chain_id,
+                "nonce": signer.nonce_manager.allocate(),
+                "maxFeePerGas": max_fee_per_gas,
+                "maxPriorityFeePerGas": max_priority_fee_per_gas,
             }
         )
         return transaction
 
-    def send_transaction(self, address: str, raw_tx: dict):
-        logging.info("sending %s", raw_tx)
-        signed_tx = self.web3.eth.account.sign_transaction(raw_tx, self.private_key)
+    def send_transaction(
+        self,
+        address: str,
+        raw_tx: dict,
+        signer: Signer,
+        signed_tx: Optional[HexBytes] = None,
+    ) -> HexBytes:
+        logging.info("sending %s to %s from %s", raw_tx, address, signer)
         try:
-            tx = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            logging.info("sent transaction %s", tx.hex())
-            receipt = self.web3.eth.waitForTransactionReceipt(tx, timeout=20)
-            tx_hash = receipt["transactionHash"].hex()
-            logging.info("transaction %s to %s confirmed", tx_hash, address)
-            return Status.SUCCESS
+            if signed_tx is None:
+                signed_tx = signer.sign_transaction(raw_tx)
+            tx_hash = self._broadcast(signed_tx)
         except Exception as ex:
-            logging.error("failed to send transaction %s: %s", raw_tx, exc_info=ex)
-            return Status.ERROR
+            signer.nonce_manager.recover(raw_tx["nonce"], ex)
+            raise
+        logging.info("sent transaction %s", tx_hash.hex())
+        return tx_hash
+
+    def _broadcast(self, signed_tx: HexBytes) -> HexBytes:
+        try:
+            return self.web3.eth.send_raw_transaction(signed_tx)
+        except Exception as ex:
+            if not (is_known_transaction_error(ex) or is_timeout_error(ex)):
+                raise
+            # NOTE: the transaction may be in the mempool, so it keeps its nonce
+            # and is tracked, its nonce is released if it turns out to be dropped
+            tx_hash = HexBytes(web3.Web3.keccak(signed_tx))
+            logging.warning("treating %s as sent: %s", tx_hash.hex(), ex)
+            return tx_hash
+
+    def _is_dropped(self, tx_hash: HexBytes) -> bool:
+        try:
+            self.web3.eth.get_transaction(tx_hash)
+            return False
+        except TransactionNotFound:
+            logging.warning("transaction %s was dropped", tx_hash.hex())
+            return True
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning("could not check transaction %s: %s", tx_hash.hex(), ex)
+            return False
+
+    @property
+    def is_unavailable(self) -> bool:
+        return self.circuit_breaker is not None and self.circuit_breaker.is_open
 
     def _execute_transaction(
         self,
-        tx_builder: TransactionBuilder,
+        create_transaction: Callable[[Signer], dict],
         address: str,
-        retries: int = 3,
+        callback: SentCallback,
+        signer_address: Optional[str] = None,
+        payouts: List[Payout] = None,
+        index: Optional[int] = None,
+        attempt: int = 0,
     ):
-        result = Status.SUCCESS
-        for i in range(retries + 1):
-            transaction = None
-            warn_params = {}
-            try:
-                transaction = self.create_transaction(tx_builder, address)
-                result = self.send_transaction(address, transaction)
-                if result == Status.SUCCESS:
-                    return result
-                error = f"received status {result}"
-            except Exception as ex:
-                error = str(ex)
-                warn_params = {"exc_info": ex}
-
-            time_to_sleep = 2 ** i
+        if payouts is None:
+            payouts = []
+        transaction = None
+        signed_tx = None
+        sending = False
+        signer = None
+        try:
+            signer = self.wallet_pool.acquire(signer_address)
+            with metrics.STAGE_LATENCY.time(stage="create_transaction"):
+                transaction = create_transaction(signer)
+            with metrics.STAGE_LATENCY.time(stage="sign"):
+                signed_tx = signer.sign_transaction(transaction)
+            self._record_signed(payouts, index, transaction, signed_tx, signer)
+            sending = True
+            with metrics.STAGE_LATENCY.time(stage="send_transaction"):
+                tx_hash = self.send_transaction(address, transaction, signer, signed_tx)
+        except Exception as ex:  # pylint: disable=broad-except
+            if signer is not None:
+                self.wallet_pool.release(signer)
+            # NOTE: send_transaction recovers the nonce once it was sent
+            if signer is not None and transaction is not None and not sending:
+                signer.nonce_manager.release(transaction["nonce"])
+            if signed_tx is not None:
+                for payout in payouts:
+                    self._record(
+                        payout.job_id,
+                        JobState.REJECTED,
+                        tx_hash=web3.Web3.keccak(signed_tx).hex(),
+                    )
+            metrics.TRANSACTION_RETRIES.inc()
+            delay = get_retry_delay(self.retry_policies, ex, attempt)
+            if delay is None:
+                logging.warning(
+                    "failed to send transaction %s: %s, giving up",
+                    transaction,
+                    ex,
+                    exc_info=ex,
+                )
+                callback(None)
+                return
             logging.warning(
-                "failed to send transaction %s: %s, sleeping %ss",
+                "failed to send transaction %s: %s, retrying in %.1fs",
                 transaction,
-                error,
-                time_to_sleep,
-                **warn_params,
+                ex,
+                delay,
+                exc_info=ex,
+            )
+            self.retry_scheduler.schedule(
+                delay,
+                functools.partial(
+                    self._execute_transaction,
+                    create_transaction,
+                    address,
+                    callback,
+                    signer_address=signer_address,
+                    payouts=payouts,
+                    index=index,
+                    attempt=attempt + 1,
+                ),
+            )
+            return
+
+        for payout in payouts:
+            self._record(payout.job_id, JobState.BROADCAST, tx_hash=tx_hash.hex())
+        callback(SentTransaction(transaction, tx_hash, signer, payouts, index))
+
+    def _replace_transaction(self, sent_tx: SentTransaction) -> Optional[HexBytes]:
+        transaction = sent_tx.transaction
+        if (
+            len(sent_tx.replacements) >= self.max_fee_bumps
+            or "maxFeePerGas" not in transaction
+        ):
+            return None
+        fees = self.fee_oracle.get_replacement_fees(
+            transaction["maxFeePerGas"], transaction["maxPriorityFeePerGas"]
+        )
+        if fees is None:
+            logging.warning(
+                "transaction %s is stuck at the maximum fee", sent_tx.tx_hash.hex()
+            )
+            return None
+
+        max_fee_per_gas, max_priority_fee_per_gas = fees
+        transaction = dict(
+            transaction,
+            maxFeePerGas=max_fee_per_gas,
+            maxPriorityFeePerGas=max_priority_fee_per_gas,
+        )
+        signed_tx = sent_tx.signer.sign_transaction(transaction)
+        self._record_signed(
+            sent_tx.payouts, sent_tx.index, transaction, signed_tx, sent_tx.signer
+        )
+        try:
+            tx_hash = self._broadcast(signed_tx)
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning(
+                "failed to replace transaction %s: %s", sent_tx.tx_hash.hex(), ex
+            )
+            for payout in sent_tx.payouts:
+                self._record(
+                    payout.job_id,
+                    JobState.REJECTED,
+                    tx_hash=web3.Web3.keccak(signed_tx).hex(),
+                )
+            return None
+
+        for payout in sent_tx.payouts:
+            self._record(payout.job_id, JobState.BROADCAST, tx_hash=tx_hash.hex())
+        sent_tx.transaction = transaction
+        sent_tx.replacements.append(tx_hash)
+        metrics.TRANSACTION_REPLACEMENTS.inc()
+        logging.info(
+            "replaced stuck transaction %s with %s at %s wei",
+            sent_tx.tx_hash.hex(),
+            tx_hash.hex(),
+            max_fee_per_gas,
+        )
+        return tx_hash
+
+    def _track(self, sent_tx: SentTransaction, callback: ReceiptCallback):
+        self.receipt_tracker.track(
+            sent_tx.tx_hash,
+            callback,
+            replace=functools.partial(self._replace_transaction, sent_tx),
+        )
+        for replacement_hash in sent_tx.replacements:
+            self.receipt_tracker.add_replacement(sent_tx.tx_hash, replacement_hash)
+
+    def _record(self, job_id: Optional[str], state: JobState, **data):
+        if self.journal is not None and job_id is not None:
+            self.journal.record(job_id, state, **data)
+
+    def _record_signed(
+        self,
+        payouts: List[Payout],
+        index: Optional[int],
+        transaction: dict,
+        signed_tx: HexBytes,
+        signer: Signer,
+    ):
+        if self.journal is None or not payouts:
+            return
+        for payout in payouts:
+            self._record(
+                payout.job_id,
+                JobState.SIGNED,
+                tx_hash=web3.Web3.keccak(signed_tx).hex(),
+                raw_tx=signed_tx.hex(),
+                signer=signer.address,
+                nonce=transaction["nonce"],
+                index=index,
+                transaction=transaction,
+            )
+        self.journal.sync()
+
+    def receive(self, message: Message) -> Optional[str]:
+        if self.recorder is not None:
+            self.recorder.record(message)
+        if self.recent_messages is not None and not self.recent_messages.add(message):
+            metrics.MESSAGES_DEDUPLICATED.inc(source=message.source, kind="message")
+            logging.info(
+                "dropping duplicate message %s from %s", message.id, message.source
+            )
+            return None
+        job_id = f"{message.source}:{message.id}"
+        self._record(job_id, JobState.RECEIVED, message=asdict(message))
+        return job_id
+
+    def discard(self, message: Message):
+        self._record(f"{message.source}:{message.id}", JobState.FAILED)
+
+    def send_transactions(
+        self,
+        address: str,
+        user_id: Optional[str] = None,
+        callback: Optional[ResultCallback] = None,
+        job_id: Optional[str] = None,
+    ) -> str:
+        if job_id is None:
+            job_id = uuid.uuid4().hex
+        if self.is_unavailable:
+            self._notify(callback, Result(Status.ERROR))
+            return job_id
+        reservation = self.rate_limiter.reserve(user_id=user_id, address=address)
+        self._record(
+            job_id, JobState.VALIDATED, address=address, reservation=asdict(reservation)
+        )
+        self.send_payout(Payout(address, reservation, callback, job_id=job_id))
+        return job_id
+
+    def send_payout(
+        self, payout: Payout, sent: Optional[Dict[int, SentTransaction]] = None
+    ):
+        if self.batcher is not None and not sent:
+            self.batcher.add(payout)
+            return
+        self._send_next_transaction(payout, dict(sent or {}))
+
+    def _send_next_transaction(self, payout: Payout, sent: Dict[int, SentTransaction]):
+        for index, tx_builder in enumerate(self.transaction_builders):
+            if index in sent:
+                continue
+            self._execute_transaction(
+                functools.partial(self.create_transaction, tx_builder, payout.address),
+                payout.address,
+                functools.partial(self._on_transaction_sent, payout, sent, index),
+                signer_address=tx_builder.signer_address,
+                payouts=[payout],
+                index=index,
+            )
+            return
+
+        sent_txs = [sent[index] for index in sorted(sent)]
+        payout.tx_hashes = [sent_tx.tx_hash.hex() for sent_tx in sent_txs]
+        payout.pending = len(sent_txs)
+        if not sent_txs:
+            self._complete_payout(payout, Status.SUCCESS)
+        for sent_tx in sent_txs:
+            self._track(sent_tx, functools.partial(self._on_receipt, payout, sent_tx))
+
+    def _on_transaction_sent(
+        self,
+        payout: Payout,
+        sent: Dict[int, SentTransaction],
+        index: int,
+        sent_tx: Optional[SentTransaction],
+    ):
+        if sent_tx is not None:
+            sent[index] = sent_tx
+            self._send_next_transaction(payout, sent)
+            return
+
+        for sent_tx in sent.values():
+            payout.tx_hashes.append(sent_tx.tx_hash.hex())
+            self._track(sent_tx, functools.partial(self._on_transaction_done, sent_tx))
+        self._complete_payout(payout, Status.ERROR)
+
+    def _on_transaction_done(
+        self, sent_tx: SentTransaction, receipt: Optional[TxReceipt]
+    ):
+        self.wallet_pool.release(sent_tx.signer)
+        if receipt is None and all(map(self._is_dropped, sent_tx.tx_hashes)):
+            sent_tx.signer.nonce_manager.release(sent_tx.transaction["nonce"])
+        elif receipt is not None and sent_tx.replacements:
+            self._resolve_tx_hash(sent_tx, receipt)
+
+    @staticmethod
+    def _resolve_tx_hash(sent_tx: SentTransaction, receipt: TxReceipt):
+        tx_hash = HexBytes(receipt["transactionHash"])
+        replaced = {h.hex() for h in sent_tx.tx_hashes}
+        for payout in sent_tx.payouts:
+            payout.tx_hashes = [
+                tx_hash.hex() if h in replaced else h for h in payout.tx_hashes
+            ]
+        sent_tx.tx_hash = tx_hash
+
+    def _on_receipt(
+        self,
+        payout: Payout,
+        sent_tx: SentTransaction,
+        receipt: Optional[TxReceipt],
+    ):
+        self._on_transaction_done(sent_tx, receipt)
+        self._observe_receipt(sent_tx, receipt)
+        tx_hash = sent_tx.tx_hash
+        if receipt is None:
+            logging.error("transaction %s timed out", tx_hash.hex())
+            status = Status.ERROR
+        elif receipt["status"] == 0:
+            logging.error("transaction %s to %s failed", tx_hash.hex(), payout.address)
+            status = Status.ERROR
+        else:
+            logging.info(
+                "transaction %s to %s confirmed", tx_hash.hex(), payout.address
+            )
+            status = Status.SUCCESS
+
+        with self._payouts_lock:
+            if payout.done:
+                return
+            payout.pending -= 1
+            if status == Status.SUCCESS and payout.pending > 0:
+                return
+            payout.done = True
+        self._complete_payout(payout, status)
+
+    def _send_batch(self, payouts: List[Payout]):
+        assert self.batch_transaction_builder is not None
+        addresses = [payout.address for payout in payouts]
+        self._execute_transaction(
+            functools.partial(self.create_batch_transaction, addresses),
+            ", ".join(addresses),
+            functools.partial(self._on_batch_sent, payouts),
+            signer_address=self.batch_transaction_builder.signer_address,
+            payouts=payouts,
+        )
+
+    def _on_batch_sent(self, payouts: List[Payout], sent_tx: Optional[SentTransaction]):
+        if sent_tx is None:
+            for payout in payouts:
+                self._complete_payout(payout, Status.ERROR)
+            return
+
+        for payout in payouts:
+            payout.tx_hashes.append(sent_tx.tx_hash.hex())
+        self._track(
+            sent_tx, functools.partial(self._on_batch_receipt, payouts, sent_tx)
+        )
+
+    def _on_batch_receipt(
+        self,
+        payouts: List[Payout],
+        sent_tx: SentTransaction,
+        receipt: Optional[TxReceipt],
+    ):
+        assert self.batch_transaction_builder is not None
+        self._on_transaction_done(sent_tx, receipt)
+        self._observe_receipt(sent_tx, receipt)
+        tx_hash = sent_tx.tx_hash
+        statuses = {}
+        if receipt is None:
+            logging.error("batch transaction %s timed out", tx_hash.hex())
+        elif receipt["status"] == 0:
+            logging.error("batch transaction %s failed", tx_hash.hex())
+        else:
+            statuses = self.batch_transaction_builder.get_statuses(receipt)
+            logging.info(
+                "batch transaction %s to %s receivers confirmed",
+                tx_hash.hex(),
+                len(payouts),
+            )
+
+        for payout in payouts:
+            success = statuses.get(payout.address.lower(), False)
+            self._complete_payout(payout, Status.SUCCESS if success else Status.ERROR)
+
+    @staticmethod
+    def _observe_receipt(sent_tx: SentTransaction, receipt: Optional[TxReceipt]):
+        if receipt is not None:
+            metrics.STAGE_LATENCY.observe(
+                time.time() - sent_tx.sent_at, stage="receipt"
             )
-            time.sleep(time_to_sleep)
-        return result
-
-    def send_transactions(self, address: str, user_id: Optional[str] = None):
-        self.rate_limiter.add(address=address, user_id=user_id)
-        for tx_builder in self.transaction_builders:
-            result = self._execute_transaction(tx_builder, address)
-            if result != Status.SUCCESS:
-                self.rate_limiter.remove(address=address, user_id=user_id)
-                return result
-        return Status.SUCCESS
-
-    def process_message(self, message: Message) -> Status:
+
+    def _complete_payout(self, payout: Payout, status: Status):
+        metrics.STAGE_LATENCY.observe(time.time() - payout.created_at, stage="payout")
+        self._release_in_flight(payout.job_id)
+        if status == Status.SUCCESS:
+            self.rate_limiter.commit(payout.reservation)
+            self._record(payout.job_id, JobState.CONFIRMED, tx_hashes=payout.tx_hashes)
+        else:
+            self.rate_limiter.release(payout.reservation)
+            self._record(payout.job_id, JobState.FAILED, tx_hashes=payout.tx_hashes)
+        self._notify(payout.callback, Result(status, payout.tx_hashes))
+
+    @staticmethod
+    def _notify(callback: Optional[ResultCallback], result: Result):
+        if callback is None:
+            return
+        try:
+            callback(result)
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning("result callback failed: %s", ex, exc_info=ex)
+
+    def process_message(
+        self,
+        message: Message,
+        callback: Optional[ResultCallback] = None,
+        job_id: Optional[str] = None,
+    ):
+        if job_id is None:
+            job_id = self.receive(message)
+            if job_id is None:
+                return
+        callback = functools.partial(
+            self._on_message_processed, message, job_id, callback
+        )
         if not self.run_validators(message):
-            return Status.INVALID
+            self._notify(callback, Result(Status.INVALID))
+            return
 
-        address = extract_address(message.text)
+        with metrics.STAGE_LATENCY.time(stage="extract_address"):
+            address = extract_address(message.text)
         if not address:
             self.log_issue(message, "address not found")
-            return Status.INVALID
+            self._notify(callback, Result(Status.INVALID))
+            return
+
+        if self.is_unavailable:
+            self.log_issue(message, "RPC unavailable")
+            self._record(job_id, JobState.FAILED, status="unavailable")
+            self._notify(callback, Result(Status.ERROR))
+            return
 
-        if self.rate_limiter.is_rate_limited(message.user_id, address):
+        if not self._acquire_in_flight(job_id, message, address, callback):
+            return
+
+        reservation = self.rate_limiter.try_reserve(message.user_id, address)
+        if reservation is None:
+            self._release_in_flight(job_id)
             logging.warning(
                 "(%s, %s) was rate limited, skipping", message.user_id, address
             )
-            return Status.RATE_LIMITED
+            self._notify(callback, Result(Status.RATE_LIMITED))
+            return
+
+        self._record(
+            job_id, JobState.VALIDATED, address=address, reservation=asdict(reservation)
+        )
+        self.send_payout(Payout(address, reservation, callback, job_id=job_id))
+
+    def _acquire_in_flight(
+        self,
+        job_id: str,
+        message: Message,
+        address: str,
+        callback: ResultCallback,
+    ) -> bool:
+        if self.in_flight is None or self.rate_limiter.is_excluded(
+            message.user_id, address
+        ):
+            return True
+        owner = self.in_flight.acquire(job_id, message.user_id, address)
+        if owner is None:
+            return True
+        if owner == job_id:
+            logging.info("job %s is already being processed", job_id)
+            return False
+        metrics.MESSAGES_DEDUPLICATED.inc(source=message.source, kind="in_flight")
+        logging.warning(
+            "(%s, %s) already has a payout in flight, skipping",
+            message.user_id,
+            address,
+        )
+        self._notify(callback, Result(Status.RATE_LIMITED))
+        return False
+
+    def _release_in_flight(self, job_id: Optional[str]):
+        if self.in_flight is not None and job_id is not None:
+            self.in_flight.release(job_id)
+
+    def _on_message_processed(
+        self,
+        message: Message,
+        job_id: str,
+        callback: Optional[ResultCallback],
+        result: Result,
+    ):
+        metrics.MESSAGES_PROCESSED.inc(
+            source=message.source, status=result.status.name.lower()
+        )
+        if result.status in (Status.INVALID, Status.RATE_LIMITED):
+            self._record(job_id, JobState.FAILED, status=result.status.name.lower())
+        if callback is not None:
+            callback(result)
+
+    def resume_jobs(self):
+        if self.journal is None:
+            return
+        jobs = self.journal.jobs()
+        if not jobs:
+            return
+        logging.info("resuming %s unfinished jobs from the journal", len(jobs))
+
+        transactions = {}
+        for job in jobs:
+            transactions.update(job.transactions)
+        ordered = sorted(
+            transactions.items(), key=lambda item: (item[1]["signer"], item[1]["nonce"])
+        )
+        for tx_hash, transaction in ordered:
+            self._rebroadcast(tx_hash, transaction["raw_tx"])
+        for signer in self.wallet_pool.signers:
+            signer.nonce_manager.sync()
+
+        batches: Dict[Tuple[str, ...], Tuple[FaucetExecutor, List[Payout]]] = {}
+        for job in jobs:
+            executor = self
+            message = None
+            if job.message is not None:
+                message = Message(**job.message)
+                executor = self.source_executors.get(message.source, self)
+                if self.recent_messages is not None:
+                    self.recent_messages.add(message)
+            if job.reservation is None:
+                if message is not None:
+                    executor.process_message(message, job_id=job.job_id)
+                continue
+            reservation = Reservation(**job.reservation)
+            payout = Payout(
+                job.address,  # type: ignore
+                reservation,
+                None,
+                job_id=job.job_id,
+            )
+            if self.in_flight is not None and not self.rate_limiter.is_excluded(
+                reservation.user_id, reservation.address
+            ):
+                self.in_flight.acquire(
+                    job.job_id, reservation.user_id, reservation.address
+                )
+            try:
+                executor._resume_payout(job, payout, batches)
+            except ValueError as ex:
+                logging.error("could not resume job %s: %s", job.job_id, ex)
+
+        for tx_hashes, (executor, payouts) in batches.items():
+            try:
+                sent_tx = self._resume_sent_transaction(
+                    tx_hashes, transactions, payouts
+                )
+            except ValueError as ex:
+                logging.error("could not resume batch %s: %s", tx_hashes[0], ex)
+                continue
+            for payout in payouts:
+                payout.tx_hashes.append(tx_hashes[0])
+            executor._track(
+                sent_tx, functools.partial(executor._on_batch_receipt, payouts, sent_tx)
+            )
 
-        return self.send_transactions(address, user_id=message.user_id)
+    def _resume_payout(
+        self,
+        job: Job,
+        payout: Payout,
+        batches: Dict[Tuple[str, ...], Tuple["FaucetExecutor", List[Payout]]],
+    ):
+        # NOTE: replacements of a stuck transaction share its index, or have
+        # no index for a batch, and are tracked together with the original
+        by_index: Dict[Optional[int], List[str]] = {}
+        for tx_hash, transaction in job.transactions.items():
+            by_index.setdefault(transaction["index"], []).append(tx_hash)
+        if None in by_index:
+            batches.setdefault(tuple(by_index[None]), (self, []))[1].append(payout)
+            return
+        sent = {}
+        for index, tx_hashes in by_index.items():
+            sent[index] = self._resume_sent_transaction(
+                tx_hashes, job.transactions, [payout], index
+            )
+        self.send_payout(payout, sent)
+
+    def _resume_sent_transaction(
+        self,
+        tx_hashes: List[str],
+        transactions: Dict[str, dict],
+        payouts: List[Payout],
+        index: Optional[int] = None,
+    ) -> SentTransaction:
+        # NOTE: the last replacement has the highest fees, which the next fee
+        # bump starts from
+        transaction = transactions[tx_hashes[-1]]
+        signer = self.wallet_pool.acquire(transaction["signer"])
+        return SentTransaction(
+            transaction.get("transaction") or {"nonce": transaction["nonce"]},
+            HexBytes(tx_hashes[0]),
+            signer,
+            payouts,
+            index,
+            [HexBytes(tx_hash) for tx_hash in tx_hashes[1:]],
+        )
+
+    def _rebroadcast(self, tx_hash: str, raw_tx: str):
+        try:
+            self.web3.eth.send_raw_transaction(HexBytes(raw_tx))
+            logging.info("rebroadcast transaction %s", tx_hash)
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.info("did not rebroadcast transaction %s: %s", tx_hash, ex)
@@ -0,0 +1,81 @@
+import logging
+import math
+import statistics
+import threading
+import time
+from typing import Optional, Tuple
+
+from web3.main import Web3
+
+from social_faucet import settings
+
+
+class FeeOracle:
+    def __init__(
+        self,
+        web3: Web3,
+        percentile: float = settings.FEE_HISTORY_PERCENTILE,
+        block_count: int = settings.FEE_HISTORY_BLOCKS,
+        ttl: float = settings.FEE_ORACLE_TTL,
+        priority_fee_floor: int = settings.MIN_PRIORITY_FEE_PER_GAS,
+        priority_fee_ceiling: int = settings.MAX_PRIORITY_FEE_PER_GAS,
+        max_fee_ceiling: int = settings.GAS_PRICE,
+        bump_percent: float = settings.FEE_BUMP_PERCENT,
+        replacement_fee_ceiling: int = settings.MAX_REPLACEMENT_FEE_PER_GAS,
+    ):
+        self.web3 = web3
+        self.percentile = percentile
+        self.block_count = block_count
+        self.ttl = ttl
+        self.priority_fee_floor = Web3.toWei(priority_fee_floor, "gwei")
+        self.priority_fee_ceiling = Web3.toWei(priority_fee_ceiling, "gwei")
+        self.max_fee_ceiling = Web3.toWei(max_fee_ceiling, "gwei")
+        self.bump_percent = bump_percent
+        self.replacement_fee_ceiling = Web3.toWei(replacement_fee_ceiling, "gwei")
+        self._fees = (self.max_fee_ceiling, self.priority_fee_ceiling)
+        self._thread: Optional[threading.Thread] = None
+
+    def get_fees(self) -> Tuple[int, int]:
+        return self._fees
+
+    def get_replacement_fees(
+        self, max_fee: int, priority_fee: int
+    ) -> Optional[Tuple[int, int]]:
+        bump = 1 + self.bump_percent / 100
+        current_max_fee, current_priority_fee = self._fees
+        priority_fee = max(math.ceil(priority_fee * bump), current_priority_fee)
+        max_fee = max(math.ceil(max_fee * bump), current_max_fee, priority_fee)
+        if max_fee > self.replacement_fee_ceiling:
+            return None
+        return max_fee, priority_fee
+
+    def start(self):
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def refresh(self):
+        try:
+            history = self.web3.eth.fee_history(
+                self.block_count, "latest", [self.percentile]
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning("failed to fetch fee history, keeping fees: %s", ex)
+            return
+
+        rewards = [reward[0] for reward in history["reward"] if reward]
+        priority_fee = int(statistics.median(rewards)) if rewards else 0
+        priority_fee = min(
+            max(priority_fee, self.priority_fee_floor), self.priority_fee_ceiling
+        )
+        # NOTE: the last base fee is the one of the next block, doubling it
+        # keeps the transaction valid through several full blocks
+        base_fee = history["baseFeePerGas"][-1]
+        max_fee = min(2 * base_fee + priority_fee, self.max_fee_ceiling)
+        self._fees = (max(max_fee, priority_fee), priority_fee)
+        logging.debug("updated fees to %s", self._fees)
+
+    def _run(self):
+        while True:
+            time.sleep(self.ttl)
+            self.refresh()
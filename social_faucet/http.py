@@ -1,9 +1,24 @@
-from flask import Flask, request
+import csv
+import dataclasses
+import json
+import logging
+from typing import Callable, Dict, Iterator, Optional, Tuple
 
+from flask import Flask, Response, jsonify, request, stream_with_context
+from web3.main import Web3
+
+from social_faucet import metrics, settings
 
 app = Flask("social-faucet-control")
 
 
+def parse_address(address: str) -> Optional[str]:
+    # NOTE: mixed case addresses must have a valid checksum
+    if not Web3.isAddress(address):
+        return None
+    return Web3.toChecksumAddress(address)
+
+
 @app.route("/rate-limit", methods=["GET", "POST", "DELETE"])
 def rate_limit():
     address = request.values.get("address")
@@ -32,5 +47,113 @@ def send_tokens():
     address = request.form.get("address")
     if not address:
         return "'address' must be given", 400
-    app.faucet_executor.send_transactions(address)
-    return f"sent tokens to {address}"
+    address = parse_address(address)
+    if address is None:
+        return "'address' is not a valid address", 400
+    if app.faucet_executor.is_unavailable:
+        return "RPC unavailable", 503
+    job = app.job_queue.submit(address, user_id=request.form.get("user"))
+    return jsonify(job_id=job.job_id), 202
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    job = app.job_queue.get(job_id)
+    if job is None:
+        return "job not found", 404
+    return jsonify(dataclasses.asdict(job))
+
+
+@app.route("/bulk/send-tokens", methods=["POST"])
+def bulk_send_tokens():
+    def process(row: Dict[str, str]) -> dict:
+        address = row.get("address")
+        if not address:
+            raise ValueError("'address' must be given")
+        address = parse_address(address)
+        if address is None:
+            raise ValueError("'address' is not a valid address")
+        if app.faucet_executor.is_unavailable:
+            raise ValueError("RPC unavailable")
+        job = app.job_queue.submit(address, user_id=row.get("user") or None)
+        return {"job_id": job.job_id}
+
+    return stream_rows(process)
+
+
+@app.route("/bulk/rate-limit", methods=["POST", "DELETE"])
+def bulk_rate_limit():
+    method = request.method
+
+    def process(row: Dict[str, str]) -> dict:
+        address = row.get("address") or None
+        user_id = row.get("user") or None
+        if not address and not user_id:
+            raise ValueError("'address' or 'user' must be set")
+        if method == "DELETE":
+            app.rate_limiter.remove(address=address, user_id=user_id)
+            return {"removed": True}
+        seconds = str(row.get("seconds", ""))
+        if not seconds.isdecimal():
+            raise ValueError("'seconds' not given as an integer")
+        app.rate_limiter.add(user_id=user_id, address=address, seconds=int(seconds))
+        return {"rate_limited": True}
+
+    return stream_rows(process)
+
+
+@app.route("/health", methods=["GET"])
+def get_health():
+    circuit_breaker = app.faucet_executor.circuit_breaker
+    if circuit_breaker is None:
+        return jsonify(rpc=None)
+    status = 503 if circuit_breaker.is_open else 200
+    return jsonify(rpc=circuit_breaker.status()), status
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+def iter_rows() -> Iterator[Tuple[int, Optional[Dict[str, str]]]]:
+    lines = (line.decode("utf-8", errors="replace") for line in request.stream)
+    if request.mimetype == "text/csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_num, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_num, row if isinstance(row, dict) else None
+
+
+def stream_rows(process: Callable[[Dict[str, str]], dict]) -> Response:
+    def generate():
+        for line_num, row in iter_rows():
+            try:
+                if row is None:
+                    raise ValueError("row is not a JSON object")
+                result = process(row)
+            except ValueError as ex:
+                result = {"error": str(ex)}
+            yield json.dumps({"line": line_num, **result}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def serve(port: int, threads: int = settings.HTTP_THREADS):
+    try:
+        import waitress
+    except ImportError:
+        from werkzeug.serving import make_server
+
+        logging.info("waitress not installed, using the threaded werkzeug server")
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+    else:
+        waitress.serve(app, host="127.0.0.1", port=port, threads=threads)
@@ -0,0 +1,74 @@
+import collections
+import functools
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from social_faucet import settings
+from social_faucet.faucet_executor import FaucetExecutor
+from social_faucet.types import Result
+
+
+@dataclass
+class JobInfo:
+    job_id: str
+    address: str
+    user_id: Optional[str] = None
+    status: str = "queued"
+    tx_hashes: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+
+class JobQueue:
+    def __init__(
+        self,
+        faucet_executor: FaucetExecutor,
+        workers: int = settings.HTTP_JOB_WORKERS,
+        queue_size: int = settings.HTTP_JOB_QUEUE_SIZE,
+        history_size: int = settings.HTTP_JOB_HISTORY,
+    ):
+        self.faucet_executor = faucet_executor
+        self.history_size = history_size
+        self._jobs: "collections.OrderedDict[str, JobInfo]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, address: str, user_id: Optional[str] = None) -> JobInfo:
+        job = JobInfo(uuid.uuid4().hex, address, user_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.history_size:
+                self._jobs.popitem(last=False)
+        self._slots.acquire()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: JobInfo):
+        job.status = "sending"
+        try:
+            self.faucet_executor.send_transactions(
+                job.address,
+                user_id=job.user_id,
+                callback=functools.partial(self._on_result, job),
+                job_id=job.job_id,
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.error("job %s failed: %s", job.job_id, ex)
+            job.status = "error"
+            self._slots.release()
+
+    def _on_result(self, job: JobInfo, result: Result):
+        # NOTE: the slot is held until the payout completes, not only until it
+        # is sent, so that the queue size bounds the outstanding payouts
+        job.tx_hashes = result.tx_hashes
+        job.status = result.status.name.lower()
+        self._slots.release()
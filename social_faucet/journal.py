@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from os import path
+from typing import Dict, List, Optional
+
+from social_faucet import settings
+
+
+class JobState(Enum):
+    RECEIVED = "received"
+    VALIDATED = "validated"
+    SIGNED = "signed"
+    REJECTED = "rejected"
+    BROADCAST = "broadcast"
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
+
+
+TERMINAL_STATES = {JobState.CONFIRMED, JobState.FAILED}
+
+
+@dataclass
+class Job:
+    job_id: str
+    state: JobState = JobState.RECEIVED
+    message: Optional[dict] = None
+    address: Optional[str] = None
+    reservation: Optional[dict] = None
+    transactions: Dict[str, dict] = field(default_factory=dict)
+
+    def apply(self, record: dict):
+        state = JobState(record["state"])
+        if state == JobState.RECEIVED:
+            self.message = record.get("message")
+        elif state == JobState.VALIDATED:
+            self.address = record["address"]
+            self.reservation = record["reservation"]
+        elif state == JobState.SIGNED:
+            self.transactions[record["tx_hash"]] = {
+                "raw_tx": record["raw_tx"],
+                "signer": record["signer"],
+                "nonce": record["nonce"],
+                "index": record.get("index"),
+                "transaction": record.get("transaction"),
+            }
+        elif state == JobState.REJECTED:
+            self.transactions.pop(record["tx_hash"], None)
+            return
+        self.state = state
+
+
+class Journal:
+    def __init__(
+        self, filename: str, compact_size: int = settings.JOURNAL_COMPACT_SIZE
+    ):
+        self.filename = filename
+        self.compact_size = compact_size
+        self._records: Dict[str, List[dict]] = {}
+        self._lines: List[str] = []
+        self._queued = 0
+        self._written = 0
+        self._condition = threading.Condition()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        if path.exists(filename):
+            self._load()
+
+    def jobs(self) -> List[Job]:
+        with self._condition:
+            records = list(self._records.items())
+        jobs = []
+        for job_id, job_records in records:
+            job = Job(job_id)
+            for record in job_records:
+                job.apply(record)
+            jobs.append(job)
+        return jobs
+
+    def start(self):
+        with self._condition:
+            self._compact()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, job_id: str, state: JobState, **data):
+        record = {"job_id": job_id, "state": state.value, "time": time.time(), **data}
+        line = json.dumps(record)
+        with self._condition:
+            if state in TERMINAL_STATES:
+                self._records.pop(job_id, None)
+            else:
+                self._records.setdefault(job_id, []).append(record)
+            self._lines.append(line)
+            self._queued += 1
+            self._condition.notify_all()
+
+    def sync(self):
+        if self._thread is None:
+            return
+        with self._condition:
+            target = self._queued
+            while self._written < target:
+                self._condition.wait()
+
+    def close(self):
+        self.sync()
+        with self._condition:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _load(self):
+        with open(self.filename) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning("skipping corrupt journal record %r", line)
+                    continue
+                job_id = record["job_id"]
+                if JobState(record["state"]) in TERMINAL_STATES:
+                    self._records.pop(job_id, None)
+                else:
+                    self._records.setdefault(job_id, []).append(record)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._lines:
+                    self._condition.wait()
+                lines = self._lines
+                self._lines = []
+                queued = self._queued
+            try:
+                self._file.write("".join(line + "\n" for line in lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.error("failed to write %s journal records: %s", len(lines), ex)
+            with self._condition:
+                self._written = queued
+                if self._file.tell() > self.compact_size:
+                    self._compact()
+                self._condition.notify_all()
+
+    def _compact(self):
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            for records in self._records.values():
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp_filename, self.filename)
+        self._file = open(self.filename, "a")
+        self._lines = []
+        self._written = self._queued
+        logging.info(
+            "compacted journal %s to %s live jobs", self.filename, len(self._records)
+        )
@@ -0,0 +1,104 @@
+import collections
+import dataclasses
+import json
+import logging
+import threading
+from enum import Enum
+from os import path
+from typing import Callable, Deque, Optional
+
+from social_faucet import metrics
+from social_faucet.types import Message
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = "drop-oldest"
+    DROP_NEWEST = "drop-newest"
+    SPILL = "spill"
+
+
+class MessageBuffer:
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        spill_path: Optional[str] = None,
+        on_drop: Optional[Callable[[Message], None]] = None,
+    ):
+        if policy == OverflowPolicy.SPILL and not spill_path:
+            raise ValueError("spill_path is required to spill messages to disk")
+        self.name = name
+        self.max_size = max_size
+        self.policy = policy
+        self.spill_path = spill_path
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.spilled = 0
+        self._messages: Deque[Message] = collections.deque()
+        self._spill_offset = 0
+        self._pending_spilled = 0
+        if policy == OverflowPolicy.SPILL and path.exists(spill_path):
+            with open(spill_path) as f:
+                self._pending_spilled = sum(1 for _ in f)
+        self._condition = threading.Condition()
+        metrics.QUEUE_DEPTH.set_function(self.__len__, queue=name)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def put(self, message: Message):
+        with self._condition:
+            if len(self._messages) < self.max_size and not self._has_spilled():
+                self._messages.append(message)
+            elif self.policy == OverflowPolicy.DROP_NEWEST:
+                self._drop(message)
+                return
+            elif self.policy == OverflowPolicy.DROP_OLDEST:
+                self._drop(self._messages.popleft())
+                self._messages.append(message)
+            else:
+                self._spill(message)
+            self._condition.notify()
+
+    def get(self) -> Message:
+        with self._condition:
+            while not self._messages:
+                if self._has_spilled():
+                    self._load_spilled()
+                else:
+                    self._condition.wait()
+            return self._messages.popleft()
+
+    def _drop(self, message: Message):
+        self.dropped += 1
+        metrics.MESSAGES_DROPPED.inc(queue=self.name)
+        logging.warning("%s buffer full, dropped message %s", self.name, message.id)
+        if self.on_drop is not None:
+            self.on_drop(message)
+
+    def _spill(self, message: Message):
+        assert self.spill_path is not None
+        with open(self.spill_path, "a") as f:
+            f.write(json.dumps(dataclasses.asdict(message)) + "\n")
+        self.spilled += 1
+        self._pending_spilled += 1
+        metrics.MESSAGES_SPILLED.inc(queue=self.name)
+
+    def _has_spilled(self) -> bool:
+        return self._pending_spilled > 0
+
+    def _load_spilled(self):
+        assert self.spill_path is not None
+        with open(self.spill_path, "r+") as f:
+            f.seek(self._spill_offset)
+            while len(self._messages) < self.max_size:
+                line = f.readline()
+                if not line:
+                    break
+                self._messages.append(Message(**json.loads(line)))
+                self._pending_spilled -= 1
+            self._spill_offset = f.tell()
+            if not self._pending_spilled:
+                f.truncate(0)
+                self._spill_offset = 0
@@ -0,0 +1,239 @@
+import bisect
+import contextlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from social_faucet import settings
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Registry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.metrics: List["Metric"] = []
+
+    def register(self, metric: "Metric"):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Registry = None,
+    ):
+        if registry is None:
+            registry = REGISTRY
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _labels_key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], **extra: str) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        pass
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not self.registry.enabled:
+            return
+        key = self._labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{self._format_labels(k)} {v}" for k, v in values]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._labels_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not self.registry.enabled:
+            return
+        key = self._labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels: str):
+        with self._lock:
+            self._functions[self._labels_key(labels)] = function
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, function in functions:
+            values[key] = function()
+        return [f"{self.name}{self._format_labels(k)} {v}" for k, v in values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str):
+        if not self.registry.enabled:
+            return
+        key = self._labels_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    def time(self, **labels: str):
+        if not self.registry.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            counts = {key: list(values) for key, values in self._counts.items()}
+            sums = dict(self._sums)
+        lines = []
+        for key, values in counts.items():
+            cumulative = 0
+            for bucket, count in zip(self.buckets, values):
+                cumulative += count
+                labels = self._format_labels(key, le=str(bucket))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += values[-1]
+            labels = self._format_labels(key, le="+Inf")
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {sums[key]}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+REGISTRY = Registry(enabled=settings.METRICS_ENABLED)
+
+STAGE_LATENCY = Histogram(
+    "faucet_stage_seconds", "Latency of the faucet processing stages", ["stage"]
+)
+RATE_LIMITER_LATENCY = Histogram(
+    "faucet_rate_limiter_seconds", "Latency of rate limiter operations", ["operation"]
+)
+MESSAGES_RECEIVED = Counter(
+    "faucet_messages_received_total", "Messages received by source", ["source"]
+)
+MESSAGES_PROCESSED = Counter(
+    "faucet_messages_processed_total",
+    "Messages processed by source and final status",
+    ["source", "status"],
+)
+MESSAGES_DEDUPLICATED = Counter(
+    "faucet_messages_deduplicated_total",
+    "Messages dropped as a redelivery or while a payout was in flight",
+    ["source", "kind"],
+)
+MESSAGES_DROPPED = Counter(
+    "faucet_messages_dropped_total", "Messages dropped by a full buffer", ["queue"]
+)
+MESSAGES_SPILLED = Counter(
+    "faucet_messages_spilled_total",
+    "Messages spilled to disk by a full buffer",
+    ["queue"],
+)
+TRANSACTION_RETRIES = Counter(
+    "faucet_transaction_retries_total", "Failed attempts to send a transaction"
+)
+TRANSACTION_REPLACEMENTS = Counter(
+    "faucet_transaction_replacements_total",
+    "Stuck transactions replaced with bumped fees",
+)
+QUEUE_DEPTH = Gauge("faucet_queue_depth", "Messages waiting to be processed", ["queue"])
+RPC_CIRCUIT_OPEN = Gauge(
+    "faucet_rpc_circuit_open", "Whether RPC calls currently fail fast"
+)
+IN_FLIGHT_TRANSACTIONS = Gauge(
+    "faucet_in_flight_transactions", "Broadcast transactions waiting for a receipt"
+)
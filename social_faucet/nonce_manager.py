@@ -0,0 +1,68 @@
+import logging
+import threading
+from typing import Optional, Set
+
+import requests
+from web3.main import Web3
+
+
+def is_nonce_error(ex: Exception) -> bool:
+    error = str(ex).lower()
+    return "nonce" in error and ("too low" in error or "too high" in error)
+
+
+def is_known_transaction_error(ex: Exception) -> bool:
+    error = str(ex).lower()
+    return "already known" in error or "known transaction" in error
+
+
+def is_timeout_error(ex: Exception) -> bool:
+    # NOTE: the request was sent, so the node may have accepted the transaction
+    return isinstance(ex, (requests.ReadTimeout, TimeoutError))
+
+
+class NonceManager:
+    def __init__(self, web3: Web3, address: Optional[str]):
+        self.web3 = web3
+        self.address = address
+        self._next_nonce: Optional[int] = None
+        self._released: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._next_nonce is None:
+                self._sync()
+            if self._released:
+                nonce = min(self._released)
+                self._released.remove(nonce)
+                return nonce
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def release(self, nonce: int):
+        with self._lock:
+            if self._next_nonce is None or nonce >= self._next_nonce:
+                return
+            self._released.add(nonce)
+            while self._next_nonce - 1 in self._released:
+                self._next_nonce -= 1
+                self._released.remove(self._next_nonce)
+
+    def recover(self, nonce: int, ex: Exception):
+        if is_nonce_error(ex):
+            self.sync()
+        else:
+            self.release(nonce)
+
+    def _sync(self):
+        self._next_nonce = self.web3.eth.get_transaction_count(
+            self.address, "pending"  # type: ignore
+        )
+        self._released.clear()
+        logging.info("synced nonce of %s to %s", self.address, self._next_nonce)
@@ -0,0 +1,167 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3._utils.encoding import Web3JsonEncoder
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from social_faucet import settings
+
+BATCHED_METHODS = {
+    "eth_blockNumber",
+    "eth_chainId",
+    "eth_getBalance",
+    "eth_getTransactionByHash",
+    "eth_getTransactionCount",
+    "eth_getTransactionReceipt",
+}
+
+
+@dataclass
+class _Call:
+    request: dict
+    timeout: float
+    done: threading.Event = field(default_factory=threading.Event)
+    response: Optional[RPCResponse] = None
+    error: Optional[Exception] = None
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    def __init__(
+        self,
+        endpoints: List[str],
+        pool_size: int = settings.RPC_POOL_SIZE,
+        batch_size: int = settings.RPC_BATCH_SIZE,
+        batch_window: float = settings.RPC_BATCH_WINDOW,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = settings.RPC_TIMEOUT,
+        cooldown: float = settings.RPC_ENDPOINT_COOLDOWN,
+    ):
+        super().__init__()
+        if not endpoints:
+            raise ValueError("at least one RPC endpoint is required")
+        if timeouts is None:
+            timeouts = settings.RPC_METHOD_TIMEOUTS
+        self.endpoints = list(endpoints)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+        self.cooldown = cooldown
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(endpoints), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._failed_until: Dict[str, float] = {}
+        self._request_ids = itertools.count()
+        self._calls: List[_Call] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def __str__(self) -> str:
+        return f"RPC connection {', '.join(self.endpoints)}"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": next(self._request_ids),
+        }
+        timeout = self.timeouts.get(method, self.default_timeout)
+        if method not in BATCHED_METHODS or self.batch_size <= 1:
+            return self._post(request, timeout)
+
+        call = _Call(request, timeout)
+        with self._condition:
+            self._calls.append(call)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        assert call.response is not None
+        return call.response
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._calls:
+                    self._condition.wait()
+                deadline = time.time() + self.batch_window
+                while len(self._calls) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                calls = self._calls[: self.batch_size]
+                self._calls = self._calls[self.batch_size :]
+            try:
+                self._executor.submit(self._send_batch, calls)
+            except RuntimeError as ex:
+                # NOTE: the interpreter is exiting, waiting calls must not block it
+                for call in calls:
+                    call.error = ex
+                    call.done.set()
+
+    def _send_batch(self, calls: List[_Call]):
+        try:
+            if len(calls) == 1:
+                calls[0].response = self._post(calls[0].request, calls[0].timeout)
+                return
+            timeout = max(call.timeout for call in calls)
+            responses = self._post([call.request for call in calls], timeout)
+            if not isinstance(responses, list):
+                raise ValueError(f"invalid batch response: {responses}")
+            by_id = {response.get("id"): response for response in responses}
+            for call in calls:
+                call.response = by_id.get(call.request["id"])
+                if call.response is None:
+                    call.error = ValueError(f"no response for {call.request}")
+        except Exception as ex:  # pylint: disable=broad-except
+            for call in calls:
+                call.error = ex
+        finally:
+            for call in calls:
+                call.done.set()
+
+    def _post(self, payload: Union[dict, List[dict]], timeout: float) -> Any:
+        data = json.dumps(payload, cls=Web3JsonEncoder)
+        error: Optional[Exception] = None
+        for endpoint in self._ordered_endpoints():
+            try:
+                response = self.session.post(
+                    endpoint,
+                    data=data,
+                    headers={"Content-Type": "application/json"},
+                    timeout=timeout,
+                )
+                response.raise_for_status()
+                return response.json()
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                error = ex
+            except requests.HTTPError as ex:
+                if ex.response is not None and ex.response.status_code < 500:
+                    raise
+                error = ex
+            self._failed_until[endpoint] = time.time() + self.cooldown
+            logging.warning("RPC endpoint %s failed: %s", endpoint, error)
+        assert error is not None
+        raise error
+
+    def _ordered_endpoints(self) -> List[str]:
+        now = time.time()
+        healthy = [e for e in self.endpoints if self._failed_until.get(e, 0) <= now]
+        failed = [e for e in self.endpoints if e not in healthy]
+        return healthy + failed
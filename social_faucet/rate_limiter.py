@@ -1,33 +1,101 @@
 import threading
 import time
-from typing import Iterable, Optional
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
 
-from social_faucet import settings
+from social_faucet import metrics, settings
+from social_faucet.storage import RateLimitStorage
+
+
+@dataclass
+class Reservation:
+    user_id: Optional[str]
+    address: Optional[str]
+    limit_until: int
+    # keys written by the reservation, all of its keys if None
+    keys: Optional[List[str]] = None
 
 
 class RateLimiter:
-    def __init__(self, db, excluded_users: Optional[Iterable[str]] = None):
-        self.db = db
+    def __init__(
+        self, storage: RateLimitStorage, excluded_users: Optional[Iterable[str]] = None
+    ):
+        self.storage = storage
         if excluded_users is None:
             excluded_users = set()
         self.excluded_users = set(excluded_users)
         self._lock = threading.Lock()
 
+    def try_reserve(self, user_id, address) -> Optional[Reservation]:
+        timer = metrics.RATE_LIMITER_LATENCY.time(operation="try_reserve")
+        with timer, self._lock:
+            if self.is_rate_limited(user_id, address):
+                return None
+            return self._reserve(user_id, address)
+
+    def reserve(self, user_id=None, address=None) -> Reservation:
+        timer = metrics.RATE_LIMITER_LATENCY.time(operation="reserve")
+        with timer, self._lock:
+            return self._reserve(user_id, address)
+
+    def commit(self, reservation: Reservation, seconds=settings.RATE_LIMIT):
+        now = int(time.time())
+        limit_until = now + seconds
+        timer = metrics.RATE_LIMITER_LATENCY.time(operation="commit")
+        with timer, self._lock:
+            for key in self._created_keys(reservation):
+                # NOTE: the reservation may have expired, and been purged, while
+                # the payout was pending, only another active limit is kept
+                current = self.storage.get(key)
+                if current <= now or current == reservation.limit_until:
+                    self.storage.set(key, limit_until)
+
+    def release(self, reservation: Reservation):
+        timer = metrics.RATE_LIMITER_LATENCY.time(operation="release")
+        with timer, self._lock:
+            for key in self._created_keys(reservation):
+                if self.storage.get(key) == reservation.limit_until:
+                    self.storage.delete(key)
+
+    def _reserve(self, user_id, address) -> Reservation:
+        current_timestamp = int(time.time())
+        limit_until = current_timestamp + settings.RESERVATION_TIMEOUT
+        reservation = Reservation(user_id, address, limit_until, keys=[])
+        for key in self._reservation_keys(reservation):
+            # NOTE: an active limit, e.g. set by an operator, is kept as is, so
+            # that releasing the reservation does not remove it
+            if self.storage.get(key) > current_timestamp:
+                continue
+            self.storage.set(key, limit_until)
+            reservation.keys.append(key)
+        return reservation
+
+    def _created_keys(self, reservation: Reservation) -> List[str]:
+        if reservation.keys is None:
+            return self._reservation_keys(reservation)
+        return reservation.keys
+
+    def _reservation_keys(self, reservation: Reservation) -> List[str]:
+        keys = []
+        if reservation.user_id:
+            keys.append(self._user_key(reservation.user_id))
+        if reservation.address:
+            keys.append(self._address_key(reservation.address))
+        return keys
+
     def add(self, user_id=None, address=None, seconds=settings.RATE_LIMIT):
         current_timestamp = int(time.time())
         limit_until = current_timestamp + seconds
-        with self._lock:
-            if user_id:
-                self.db[self._user_key(user_id)] = str(limit_until)
-            if address:
-                self.db[self._address_key(address)] = str(limit_until)
+        if user_id:
+            self.storage.set(self._user_key(user_id), limit_until)
+        if address:
+            self.storage.set(self._address_key(address), limit_until)
 
     def remove(self, user_id=None, address=None):
-        with self._lock:
-            if user_id:
-                del self.db[self._user_key(user_id)]
-            if address:
-                del self.db[self._address_key(address)]
+        if user_id:
+            self.storage.delete(self._user_key(user_id))
+        if address:
+            self.storage.delete(self._address_key(address))
 
     def get(self, value: str) -> int:
         if value.startswith("0x"):
@@ -35,15 +103,16 @@ class RateLimiter:
         return self.get_user(value)
 
     def get_user(self, user_id: str) -> int:
-        with self._lock:
-            return int(self.db.get(self._user_key(user_id), 0))
+        return self.storage.get(self._user_key(user_id))
 
     def get_address(self, address: str) -> int:
-        with self._lock:
-            return int(self.db.get(self._address_key(address), 0))
+        return self.storage.get(self._address_key(address))
+
+    def is_excluded(self, user_id, address) -> bool:
+        return str(user_id) in self.excluded_users or address in self.excluded_users
 
     def is_rate_limited(self, user_id, address):
-        if str(user_id) in self.excluded_users or address in self.excluded_users:
+        if self.is_excluded(user_id, address):
             return False
         user_timestamp = self.get_user(user_id)
         address_timestamp = self.get_address(address)
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+from web3.main import Web3
+from web3.types import TxReceipt
+
+from social_faucet import settings
+from social_faucet.circuit_breaker import CircuitOpenError
+
+ReceiptCallback = Callable[[Optional[TxReceipt]], None]
+ReplaceCallback = Callable[[], Optional[HexBytes]]
+
+
+@dataclass
+class _TrackedTransaction:
+    tx_hashes: List[HexBytes]
+    callback: ReceiptCallback
+    replace: Optional[ReplaceCallback]
+    deadline: float
+    sent_at: float
+
+
+class ReceiptTracker:
+    def __init__(
+        self,
+        web3: Web3,
+        timeout: float = settings.RECEIPT_TIMEOUT,
+        poll_interval: float = settings.RECEIPT_POLL_INTERVAL,
+        concurrency: int = settings.RECEIPT_POLL_CONCURRENCY,
+        stuck_timeout: float = settings.STUCK_TRANSACTION_TIMEOUT,
+    ):
+        self.web3 = web3
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.stuck_timeout = stuck_timeout
+        self._pending: Dict[HexBytes, _TrackedTransaction] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def track(
+        self,
+        tx_hash: HexBytes,
+        callback: ReceiptCallback,
+        replace: Optional[ReplaceCallback] = None,
+    ):
+        now = time.time()
+        with self._condition:
+            self._pending[tx_hash] = _TrackedTransaction(
+                [tx_hash], callback, replace, now + self.timeout, now
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def add_replacement(self, tx_hash: HexBytes, replacement_hash: HexBytes):
+        now = time.time()
+        with self._condition:
+            tracked = self._pending.get(tx_hash)
+            if tracked is None:
+                return
+            tracked.tx_hashes.append(replacement_hash)
+            tracked.deadline = now + self.timeout
+            tracked.sent_at = now
+
+    def _run(self):
+        polled_at = time.time()
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                pending = [
+                    (tx_hash, tracked, list(tracked.tx_hashes))
+                    for tx_hash, tracked in self._pending.items()
+                ]
+
+            elapsed = time.time() - polled_at
+            polled_at = time.time()
+            tx_hashes = [h for _, _, hashes in pending for h in hashes]
+            receipts = dict(
+                zip(tx_hashes, self._executor.map(self._get_receipt, tx_hashes))
+            )
+            for tx_hash, tracked, hashes in pending:
+                receipt = next(
+                    (receipts[h][0] for h in hashes if receipts[h][0] is not None),
+                    None,
+                )
+                if receipt is None and not all(receipts[h][1] for h in hashes):
+                    # NOTE: the node could not tell whether the transaction was
+                    # mined, so its deadlines are paused until it can
+                    with self._condition:
+                        tracked.deadline += elapsed
+                        tracked.sent_at += elapsed
+                    continue
+                now = time.time()
+                if receipt is None and now < tracked.deadline:
+                    if (
+                        tracked.replace is not None
+                        and now - tracked.sent_at >= self.stuck_timeout
+                    ):
+                        self._replace(tx_hash, tracked)
+                    continue
+                with self._condition:
+                    del self._pending[tx_hash]
+                try:
+                    tracked.callback(receipt)
+                except Exception as ex:  # pylint: disable=broad-except
+                    logging.error(
+                        "receipt callback failed for %s: %s",
+                        tx_hash.hex(),
+                        ex,
+                        exc_info=ex,
+                    )
+
+            time.sleep(self.poll_interval)
+
+    def _replace(self, tx_hash: HexBytes, tracked: _TrackedTransaction):
+        assert tracked.replace is not None
+        tracked.sent_at = time.time()
+        try:
+            replacement_hash = tracked.replace()
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning("failed to replace %s: %s", tx_hash.hex(), ex, exc_info=ex)
+            return
+        if replacement_hash is not None:
+            self.add_replacement(tx_hash, replacement_hash)
+
+    def _get_receipt(self, tx_hash: HexBytes) -> Tuple[Optional[TxReceipt], bool]:
+        # returns the receipt, if any, and whether the node could be queried
+        try:
+            return self.web3.eth.get_transaction_receipt(tx_hash), True
+        except TransactionNotFound:
+            return None, True
+        except CircuitOpenError:
+            return None, False
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning("failed to fetch receipt of %s: %s", tx_hash.hex(), ex)
+            return None, False
@@ -0,0 +1,32 @@
+import dataclasses
+import json
+import threading
+import time
+from typing import Iterator, Tuple
+
+from social_faucet.types import Message
+
+
+class MessageRecorder:
+    def __init__(self, filename: str):
+        self.filename = filename
+        # NOTE: line buffered, a crash loses at most the message being written
+        self._file = open(filename, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def record(self, message: Message):
+        line = json.dumps({"time": time.time(), "message": dataclasses.asdict(message)})
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load_recording(filename: str) -> Iterator[Tuple[float, Message]]:
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["time"], Message(**record["message"])
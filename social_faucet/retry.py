@@ -0,0 +1,103 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple
+
+from social_faucet import settings
+from social_faucet.circuit_breaker import CircuitOpenError
+from social_faucet.nonce_manager import is_nonce_error
+
+
+class ErrorClass(Enum):
+    REVERT = "revert"
+    NONCE = "nonce"
+    TRANSIENT = "transient"
+    UNAVAILABLE = "unavailable"
+
+
+def classify_error(ex: Exception) -> ErrorClass:
+    if isinstance(ex, CircuitOpenError):
+        return ErrorClass.UNAVAILABLE
+    if is_nonce_error(ex):
+        return ErrorClass.NONCE
+    error = str(ex).lower()
+    if "revert" in error or "invalid opcode" in error:
+        return ErrorClass.REVERT
+    return ErrorClass.TRANSIENT
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int
+    base_delay: float = settings.RETRY_BASE_DELAY
+    max_delay: float = settings.RETRY_MAX_DELAY
+
+    def get_delay(self, attempt: int) -> Optional[float]:
+        if attempt >= self.max_retries:
+            return None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+DEFAULT_RETRY_POLICIES = {
+    ErrorClass.REVERT: RetryPolicy(max_retries=0),
+    ErrorClass.NONCE: RetryPolicy(
+        max_retries=settings.TRANSACTION_RETRIES, base_delay=0.1
+    ),
+    ErrorClass.TRANSIENT: RetryPolicy(max_retries=settings.TRANSACTION_RETRIES),
+    ErrorClass.UNAVAILABLE: RetryPolicy(max_retries=0),
+}
+
+
+class RetryScheduler:
+    def __init__(self, workers: int = settings.RETRY_WORKERS):
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, delay: float, callback: Callable[[], None]):
+        with self._condition:
+            heapq.heappush(
+                self._heap, (time.time() + delay, next(self._counter), callback)
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                due_at, _, callback = self._heap[0]
+                remaining = due_at - time.time()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+            self._executor.submit(self._call, callback)
+
+    @staticmethod
+    def _call(callback: Callable[[], None]):
+        try:
+            callback()
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.error("scheduled retry failed: %s", ex, exc_info=ex)
+
+
+def get_retry_delay(
+    policies: Dict[ErrorClass, RetryPolicy], ex: Exception, attempt: int
+) -> Optional[float]:
+    return policies[classify_error(ex)].get_delay(attempt)
@@ -1,17 +1,29 @@
-import dbm
-from threading import Thread
+import json
+import logging
+from threading import Event, Thread
 from typing import Iterable, List, Optional
 
 from web3.main import Web3
 
-from social_faucet.http import app
+from social_faucet import settings
+from social_faucet.cache import CachedStorage
+from social_faucet.circuit_breaker import CircuitBreaker
+from social_faucet.dedup import InFlightPayouts, RecentMessages
+from social_faucet.http import app, serve
 from social_faucet.faucet import (
     DiscordMintTokensAsOwnerKovanFaucet,
     Faucet,
     TwitterKovanFaucet,
+    create_faucet,
 )
 from social_faucet.faucet_executor import FaucetExecutor
+from social_faucet.jobs import JobQueue
+from social_faucet.journal import Journal
+from social_faucet.provider import PooledHTTPProvider
 from social_faucet.rate_limiter import RateLimiter
+from social_faucet.recorder import MessageRecorder
+from social_faucet.storage import open_storage
+from social_faucet.wallet import WalletPool, WalletRebalancer
 
 
 def launch_control_app(
@@ -19,33 +31,147 @@ def launch_control_app(
 ):
     app.rate_limiter = rate_limiter
     app.faucet_executor = faucet_executor
-    app_thread = Thread(
-        target=app.run, kwargs={"port": port, "debug": False}, daemon=True
-    )
+    app.job_queue = JobQueue(faucet_executor)
+    app_thread = Thread(target=serve, args=(port,), daemon=True)
     app_thread.start()
 
 
-def run_faucet(
+def create_wallet_pool(web3: Web3) -> Optional[WalletPool]:
+    if not settings.SHARD_PRIVATE_KEYS:
+        return None
+    private_keys = [settings.KOVAN_PRIVATE_KEY] + settings.SHARD_PRIVATE_KEYS
+    wallet_pool = WalletPool.from_private_keys(web3, private_keys)  # type: ignore
+    wallet_pool.start()
+    return wallet_pool
+
+
+def create_journal() -> Optional[Journal]:
+    if not settings.JOURNAL_PATH:
+        return None
+    journal = Journal(settings.JOURNAL_PATH)
+    journal.start()
+    return journal
+
+
+def listen(faucets: List[Faucet], executors: List[FaucetExecutor]):
+    if len(faucets) == 1:
+        faucets[0].listen(executors[0])
+        return
+
+    stopped = Event()
+
+    def listen_source(faucet: Faucet, faucet_executor: FaucetExecutor):
+        try:
+            faucet.listen(faucet_executor)
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.error("%s faucet failed: %s", faucet.source, ex, exc_info=ex)
+        finally:
+            logging.warning("%s faucet stopped", faucet.source)
+            stopped.set()
+
+    for faucet, faucet_executor in zip(faucets, executors):
+        Thread(
+            target=listen_source,
+            args=(faucet, faucet_executor),
+            name=f"{faucet.source}-faucet",
+            daemon=True,
+        ).start()
+    stopped.wait()
+
+
+def run_faucets(
     web3: Web3,
-    faucet: Faucet,
+    faucets: List[Faucet],
     db_path: str,
     control_port: int,
     rate_limited_exclusions: Optional[Iterable[str]],
 ):
-    with dbm.open(db_path, "c") as db:
-        rate_limiter = RateLimiter(db, excluded_users=rate_limited_exclusions)
-        transaction_builders = faucet.create_transaction_builders(web3)
-        validators = faucet.create_validators()
+    sources = [faucet.source for faucet in faucets]
+    duplicates = {source for source in sources if sources.count(source) > 1}
+    if duplicates:
+        # NOTE: jobs are replayed from the journal by the faucet of their source
+        raise ValueError(f"more than one faucet for {', '.join(sorted(duplicates))}")
+    storage = CachedStorage(open_storage(db_path))
+    storage.start_compaction()
+    journal = create_journal()
+    recorder = MessageRecorder(settings.RECORD_PATH) if settings.RECORD_PATH else None
+    try:
+        rate_limiter = RateLimiter(storage, excluded_users=rate_limited_exclusions)
+        main_faucet = faucets[0]
+        circuit_breaker = CircuitBreaker(web3)
+        circuit_breaker.install()
+        wallet_pool = create_wallet_pool(web3)
         faucet_executor = FaucetExecutor(
             web3,
             rate_limiter,
-            transaction_builders=transaction_builders,
-            validators=validators,
+            transaction_builders=main_faucet.create_transaction_builders(web3),
+            validators=main_faucet.create_validators(),
+            batch_transaction_builder=main_faucet.create_batch_transaction_builder(
+                web3
+            ),
+            wallet_pool=wallet_pool,
+            journal=journal,
+            circuit_breaker=circuit_breaker,
+            recent_messages=RecentMessages(),
+            in_flight=InFlightPayouts(),
+            recorder=recorder,
         )
+        executors = [faucet_executor]
+        faucet_executor.source_executors[main_faucet.source] = faucet_executor
+        for faucet in faucets[1:]:
+            source_executor = faucet_executor.for_source(
+                faucet.source,
+                faucet.create_transaction_builders(web3),
+                validators=faucet.create_validators(),
+                batch_transaction_builder=faucet.create_batch_transaction_builder(web3),
+            )
+            executors.append(source_executor)
+
+        if wallet_pool is not None and settings.SHARD_REBALANCE:
+            main_signer = wallet_pool.signers[0]
+            rebalancer = WalletRebalancer(
+                web3,
+                wallet_pool,
+                main_signer,
+                faucet_executor.fee_oracle,
+                faucet_executor.receipt_tracker,
+            )
+            rebalancer.start()
 
+        faucet_executor.resume_jobs()
         launch_control_app(control_port, rate_limiter, faucet_executor)
 
-        faucet.listen(faucet_executor)
+        listen(faucets, executors)
+    finally:
+        if journal is not None:
+            journal.close()
+        if recorder is not None:
+            recorder.close()
+        storage.close()
+
+
+def run_faucet(
+    web3: Web3,
+    faucet: Faucet,
+    db_path: str,
+    control_port: int,
+    rate_limited_exclusions: Optional[Iterable[str]],
+):
+    run_faucets(web3, [faucet], db_path, control_port, rate_limited_exclusions)
+
+
+def run_kovan_faucets(
+    faucets: List[Faucet],
+    db_path: str,
+    control_port: int,
+    rate_limited_exclusions: Optional[Iterable[str]],
+):
+    if settings.RPC_URLS:
+        w3 = Web3(PooledHTTPProvider(settings.RPC_URLS))
+    else:
+        from web3.auto.infura.kovan import w3
+
+    run_faucets(w3, faucets, db_path, control_port, rate_limited_exclusions)
 
 
 def run_kovan_faucet(
@@ -54,9 +180,26 @@ def run_kovan_faucet(
     control_port: int,
     rate_limited_exclusions: Optional[Iterable[str]],
 ):
-    from web3.auto.infura.kovan import w3
+    run_kovan_faucets([faucet], db_path, control_port, rate_limited_exclusions)
+
+
+def load_faucets(config_path: str) -> List[Faucet]:
+    with open(config_path) as f:
+        config = json.load(f)
+    faucets = [create_faucet(faucet_config) for faucet_config in config["faucets"]]
+    if not faucets:
+        raise ValueError(f"no faucets configured in {config_path}")
+    return faucets
+
 
-    run_faucet(w3, faucet, db_path, control_port, rate_limited_exclusions)
+def run_configured_kovan_faucets(
+    config_path: str,
+    db_path: str,
+    control_port: int,
+    rate_limited_exclusions: Optional[Iterable[str]],
+):
+    faucets = load_faucets(config_path)
+    run_kovan_faucets(faucets, db_path, control_port, rate_limited_exclusions)
 
 
 def run_twitter_kovan_faucet(
@@ -12,26 +12,104 @@ TWEET_TEXTS = ["#GyrosoftWeatherSimulator", "@GyroStable", "0x", "Kovan"]
 
 KOVAN_ADDRESS = os.environ.get("KOVAN_ADDRESS")
 KOVAN_PRIVATE_KEY = os.environ.get("KOVAN_PRIVATE_KEY")
+SHARD_PRIVATE_KEYS = [
+    key for key in os.environ.get("SHARD_PRIVATE_KEYS", "").split(",") if key
+]
+SHARD_REBALANCE = os.environ.get("SHARD_REBALANCE", "0") == "1"
+SHARD_MIN_BALANCE = 10 ** 18  # wei
+SHARD_TOP_UP_VALUE = 5 * 10 ** 18  # wei
+SHARD_REBALANCE_INTERVAL = 300  # seconds
+BALANCE_REFRESH_INTERVAL = 60  # seconds
 
 TWITTER_API_KEY = os.environ.get("TWITTER_API_KEY")
 TWITTER_SECRET_KEY = os.environ.get("TWITTER_SECRET_KEY")
 TWITTER_ACCESS_TOKEN = os.environ.get("TWITTER_ACCESS_TOKEN")
 TWITTER_ACCESS_TOKEN_SECRET = os.environ.get("TWITTER_ACCESS_TOKEN_SECRET")
+TWITTER_WORKERS = 4
+TWITTER_BUFFER_SIZE = 1000
+TWITTER_OVERFLOW_POLICY = os.environ.get("TWITTER_OVERFLOW_POLICY", "drop-oldest")
+TWITTER_SPILL_PATH = os.environ.get("TWITTER_SPILL_PATH", "twitter-spill.jsonl")
 
 DISCORD_BOT_TOKEN = os.environ.get("DISCORD_BOT_TOKEN")
 DISCORD_CHANNELS = os.environ.get("DISCORD_CHANNELS", "testnet-faucet").split(",")
+DISCORD_WORKERS = 4
+DISCORD_QUEUE_SIZE = 1000
+DISCORD_DISPATCH_CONCURRENCY = 4
+DISCORD_DISPATCH_RETRIES = 5
+DISCORD_TX_REPLIES = os.environ.get("DISCORD_TX_REPLIES") == "1"
+DISCORD_REPLY_INTERVAL = 10  # seconds
+DISCORD_MESSAGE_LIMIT = 2000
+EXPLORER_TX_URL = "https://kovan.etherscan.io/tx/{}"
 
 RATE_LIMIT_EXCLUSIONS = os.environ.get("RATE_LIMIT_EXCLUSIONS")
 
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
 META_FAUCET_ADDRESS = "0x3675318Bf01864993C93b2d486f34bb96254D81C"
 META_FAUCET_GAS = 300_000
 
+BATCH_DISPERSER_ADDRESS = os.environ.get("BATCH_DISPERSER_ADDRESS")
+BATCH_DISPERSER_GAS = 50_000
+BATCH_DISPERSER_GAS_PER_RECEIVER = 300_000
+BATCH_SIZE = 20
+BATCH_WINDOW = 2  # seconds
+
 
 LOG_FORMAT = "%(asctime)-15s - %(levelname)s - %(message)s"
 
 RATE_LIMIT = 86400
+RESERVATION_TIMEOUT = 600  # seconds
+DEDUP_MESSAGE_CAPACITY = 100_000
+DEDUP_MESSAGE_TTL = 3600  # seconds
+IN_FLIGHT_CAPACITY = 100_000
+RATE_LIMIT_COMPACTION_INTERVAL = 3600  # seconds
+RATE_LIMIT_CACHE_SIZE = 100_000
+RATE_LIMIT_BLOOM_CAPACITY = 1_000_000
 ADDRESS_LENGTH = 42
+CHECKSUM_CACHE_SIZE = 65_536
 
 SEND_VALUE = 2 * 10 ** 17
 GAS_PRICE = 100  # gwei
 MAX_PRIORITY_FEE_PER_GAS = 2  # gwei
+MIN_PRIORITY_FEE_PER_GAS = 1  # gwei
+FEE_HISTORY_PERCENTILE = 50
+FEE_HISTORY_BLOCKS = 10
+FEE_ORACLE_TTL = 15  # seconds
+FEE_BUMP_PERCENT = 12.5  # nodes require at least 10% to replace a transaction
+MAX_FEE_BUMPS = 5
+MAX_REPLACEMENT_FEE_PER_GAS = 3 * GAS_PRICE  # gwei
+
+TRANSACTION_RETRIES = 3
+RETRY_BASE_DELAY = 1  # seconds
+RETRY_MAX_DELAY = 30  # seconds
+RETRY_WORKERS = 4
+
+RECEIPT_TIMEOUT = 120  # seconds
+RECEIPT_POLL_INTERVAL = 1  # seconds
+STUCK_TRANSACTION_TIMEOUT = 30  # seconds
+
+JOURNAL_PATH = os.environ.get("JOURNAL_PATH", "faucet-journal.jsonl")
+JOURNAL_COMPACT_SIZE = 16 * 1024 * 1024  # bytes
+RECORD_PATH = os.environ.get("RECORD_PATH", "")
+
+HTTP_THREADS = 8
+HTTP_JOB_WORKERS = 4
+HTTP_JOB_QUEUE_SIZE = 1000
+HTTP_JOB_HISTORY = 100_000
+
+RPC_URLS = [url for url in os.environ.get("RPC_URLS", "").split(",") if url]
+RPC_POOL_SIZE = 16
+RPC_BATCH_SIZE = 50
+RPC_BATCH_WINDOW = 0.005  # seconds
+RPC_TIMEOUT = 10  # seconds
+RPC_METHOD_TIMEOUTS = {
+    "eth_sendRawTransaction": 30,
+    "eth_getTransactionReceipt": 5,
+    "eth_feeHistory": 5,
+}
+RPC_ENDPOINT_COOLDOWN = 30  # seconds
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_LATENCY_THRESHOLD = 5  # seconds
+CIRCUIT_PROBE_INTERVAL = 5  # seconds
+# NOTE: enough concurrent polls to fill a batch request of the pooled provider
+RECEIPT_POLL_CONCURRENCY = RPC_BATCH_SIZE
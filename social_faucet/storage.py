@@ -0,0 +1,220 @@
+import dbm
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from os import path
+from typing import Iterator, Set, Tuple
+
+from social_faucet import settings
+
+SQLITE_EXTENSIONS = {".sqlite", ".sqlite3"}
+
+
+class RateLimitStorage(ABC):
+    @abstractmethod
+    def get(self, key: str) -> int:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, limit_until: int):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, int]]:
+        pass
+
+    @abstractmethod
+    def purge_expired(self, now: int) -> int:
+        pass
+
+    def close(self):
+        pass
+
+    def start_compaction(
+        self, interval: float = settings.RATE_LIMIT_COMPACTION_INTERVAL
+    ):
+        thread = threading.Thread(target=self._compact, args=(interval,), daemon=True)
+        thread.start()
+
+    def _compact(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                purged = self.purge_expired(int(time.time()))
+                logging.info("purged %s expired rate limits", purged)
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.warning("failed to purge expired rate limits: %s", ex)
+
+
+class DbmStorage(RateLimitStorage):
+    def __init__(self, db_path: str):
+        self.db = dbm.open(db_path, "c")
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            return int(self.db.get(key, 0))
+
+    def set(self, key: str, limit_until: int):
+        with self._lock:
+            self.db[key] = str(limit_until)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            try:
+                del self.db[key]
+                return True
+            except KeyError:
+                return False
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        with self._lock:
+            items = [(key.decode(), int(self.db[key])) for key in self.db.keys()]
+        return iter(items)
+
+    def purge_expired(self, now: int) -> int:
+        expired = [key for key, limit_until in self.items() if limit_until <= now]
+        for key in expired:
+            self.delete(key)
+        return len(expired)
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+class SQLiteStorage(RateLimitStorage):
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: Set[sqlite3.Connection] = set()
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits "
+            "(key TEXT PRIMARY KEY, limit_until INTEGER NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS rate_limits_limit_until "
+            "ON rate_limits (limit_until)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        thread_connection = getattr(self._local, "connection", None)
+        if thread_connection is None:
+            connection = sqlite3.connect(
+                self.db_path, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connections_lock:
+                self._connections.add(connection)
+            thread_connection = _ThreadConnection(self, connection)
+            self._local.connection = thread_connection
+        return thread_connection.connection
+
+    def _close_connection(self, connection: sqlite3.Connection):
+        with self._connections_lock:
+            if connection not in self._connections:
+                return
+            self._connections.remove(connection)
+        connection.close()
+
+    def get(self, key: str) -> int:
+        row = (
+            self._connection()
+            .execute("SELECT limit_until FROM rate_limits WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+    def set(self, key: str, limit_until: int):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO rate_limits (key, limit_until) VALUES (?, ?)",
+            (key, limit_until),
+        )
+
+    def set_many(self, items: Iterator[Tuple[str, int]]):
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO rate_limits (key, limit_until) VALUES (?, ?)",
+                items,
+            )
+
+    def delete(self, key: str) -> bool:
+        cursor = self._connection().execute(
+            "DELETE FROM rate_limits WHERE key = ?", (key,)
+        )
+        return cursor.rowcount > 0
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return iter(
+            self._connection()
+            .execute("SELECT key, limit_until FROM rate_limits")
+            .fetchall()
+        )
+
+    def purge_expired(self, now: int) -> int:
+        cursor = self._connection().execute(
+            "DELETE FROM rate_limits WHERE limit_until <= ?", (now,)
+        )
+        return cursor.rowcount
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = set()
+
+
+class _ThreadConnection:
+    # NOTE: held in the thread local storage, which is cleared when the thread
+    # ends, so that request threads don't leave their connection open
+    def __init__(self, storage: SQLiteStorage, connection: sqlite3.Connection):
+        self.storage = storage
+        self.connection = connection
+
+    def __del__(self):
+        self.storage._close_connection(self.connection)
+
+
+def migrate_dbm(dbm_path: str, storage: SQLiteStorage):
+    now = int(time.time())
+    dbm_storage = DbmStorage(dbm_path)
+    try:
+        items = [item for item in dbm_storage.items() if item[1] > now]
+    finally:
+        dbm_storage.close()
+    storage.set_many(iter(items))
+    logging.info("migrated %s rate limits from %s", len(items), dbm_path)
+
+
+def open_storage(url: str) -> RateLimitStorage:
+    scheme, separator, location = url.partition("://")
+    if not separator:
+        scheme, location = "", url
+
+    if scheme == "dbm":
+        return DbmStorage(location)
+    if scheme == "sqlite":
+        return SQLiteStorage(location)
+    if scheme:
+        raise ValueError(f"unsupported rate limit DB scheme: {scheme}")
+
+    if path.splitext(location)[1] in SQLITE_EXTENSIONS:
+        return SQLiteStorage(location)
+
+    sqlite_path = location + ".sqlite"
+    should_migrate = not path.exists(sqlite_path) and dbm.whichdb(location)
+    storage = SQLiteStorage(sqlite_path)
+    if should_migrate:
+        migrate_dbm(location, storage)
+    return storage
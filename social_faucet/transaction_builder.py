@@ -1,11 +1,37 @@
+import functools
 from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
 
 from web3.contract import Contract
+from web3.exceptions import InvalidAddress
+from web3.logs import DISCARD
+from web3.main import Web3
+from web3.types import TxReceipt
 
 from social_faucet import settings
 
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+@functools.lru_cache(maxsize=settings.CHECKSUM_CACHE_SIZE)
+def encode_address(address: str) -> str:
+    if not Web3.isChecksumAddress(address):
+        raise InvalidAddress(f"{address} is not a checksum address")
+    return address[2:].lower().rjust(64, "0")
+
+
+def get_calldata_prefix(contract: Contract, fn_name: str, args: list) -> str:
+    # NOTE: the arguments must encode their last 32 bytes word as zero, which
+    # is then replaced by the value of each call
+    data = contract.encodeABI(fn_name, args=args)
+    assert data.endswith("0" * 64), f"{fn_name} does not end with a zero word"
+    return data[:-64]
+
 
 class TransactionBuilder(ABC):
+    # address the transaction must be sent from, any signer can send it if None
+    signer_address: Optional[str] = None
+
     @abstractmethod
     def build_transaction(self, receiver: str) -> dict:
         pass
@@ -20,11 +46,68 @@ class SendETHTransactionBuilder(TransactionBuilder):
 
 
 class MintAsOwnerTransactionBuilder(TransactionBuilder):
-    def __init__(self, contract: Contract, gas: int):
+    def __init__(self, contract: Contract, gas: int, owner: Optional[str] = None):
         self.contract = contract
         self.gas = gas
+        self.signer_address = owner
+        self.data_prefix = get_calldata_prefix(
+            contract, "mintAllAsOwner", [ZERO_ADDRESS]
+        )
 
     def build_transaction(self, receiver: str) -> dict:
-        tx = self.contract.functions.mintAllAsOwner(dst=receiver)
-        # NOTE: we avoid `buildTransaction` populating gas price and do it later
-        return tx.buildTransaction({"gas": self.gas, "gasPrice": 0})  # type: ignore
+        # NOTE: fees and chain ID are populated later by the executor
+        return {
+            "to": self.contract.address,
+            "data": self.data_prefix + encode_address(receiver),
+            "gas": self.gas,
+            "value": 0,
+        }
+
+
+class BatchTransactionBuilder(ABC):
+    signer_address: Optional[str] = None
+
+    @abstractmethod
+    def build_batch_transaction(self, receivers: List[str]) -> dict:
+        pass
+
+    @abstractmethod
+    def get_statuses(self, receipt: TxReceipt) -> Dict[str, bool]:
+        pass
+
+
+class DisperseTransactionBuilder(BatchTransactionBuilder):
+    def __init__(
+        self,
+        contract: Contract,
+        send_value: int = settings.SEND_VALUE,
+        gas: int = settings.BATCH_DISPERSER_GAS,
+        gas_per_receiver: int = settings.BATCH_DISPERSER_GAS_PER_RECEIVER,
+        owner: Optional[str] = None,
+    ):
+        self.contract = contract
+        self.send_value = send_value
+        self.gas = gas
+        self.gas_per_receiver = gas_per_receiver
+        self.signer_address = owner
+        # NOTE: with no receivers, the last word is the length of the array
+        self.data_prefix = get_calldata_prefix(contract, "disperse", [[], send_value])
+
+    def build_batch_transaction(self, receivers: List[str]) -> dict:
+        data = [self.data_prefix, f"{len(receivers):064x}"]
+        data.extend(encode_address(receiver) for receiver in receivers)
+        return {
+            "to": self.contract.address,
+            "data": "".join(data),
+            "gas": self.gas + self.gas_per_receiver * len(receivers),
+            "value": self.send_value * len(receivers),
+        }
+
+    def get_statuses(self, receipt: TxReceipt) -> Dict[str, bool]:
+        events = self.contract.events.Dispersed().processReceipt(
+            receipt, errors=DISCARD
+        )
+        return {
+            event["args"]["recipient"].lower(): event["args"]["success"]
+            for event in events
+        }
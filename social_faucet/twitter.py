@@ -1,18 +1,44 @@
 import logging
+import threading
+from typing import Callable, Optional
 
 import tweepy
 
-from social_faucet import settings
+from social_faucet import metrics, settings
 from social_faucet.faucet_executor import FaucetExecutor
+from social_faucet.message_buffer import MessageBuffer, OverflowPolicy
 from social_faucet.types import Message
 
 
+def create_message_buffer(
+    on_drop: Optional[Callable[[Message], None]] = None
+) -> MessageBuffer:
+    return MessageBuffer(
+        "twitter",
+        settings.TWITTER_BUFFER_SIZE,
+        policy=OverflowPolicy(settings.TWITTER_OVERFLOW_POLICY),
+        spill_path=settings.TWITTER_SPILL_PATH,
+        on_drop=on_drop,
+    )
+
+
 class TwitterFaucetStreamListener(tweepy.StreamListener):
-    def __init__(self, faucet: FaucetExecutor):
+    def __init__(
+        self,
+        faucet: FaucetExecutor,
+        workers: int = settings.TWITTER_WORKERS,
+        message_buffer: Optional[MessageBuffer] = None,
+    ):
         super().__init__()
         self.faucet_executor = faucet
+        if message_buffer is None:
+            message_buffer = create_message_buffer(on_drop=faucet.discard)
+        self.message_buffer = message_buffer
+        for _ in range(workers):
+            threading.Thread(target=self.process_buffer, daemon=True).start()
 
     def on_status(self, status):
+        metrics.MESSAGES_RECEIVED.inc(source="twitter")
         is_retweet = getattr(status, "retweeted_status", None) is not None
         message = Message(
             source="twitter",
@@ -21,7 +47,18 @@ class TwitterFaucetStreamListener(tweepy.StreamListener):
             text=status.text,
             extra={"is_retweet": is_retweet},
         )
-        self.faucet_executor.process_message(message)
+        if self.faucet_executor.receive(message) is not None:
+            self.message_buffer.put(message)
+
+    def process_buffer(self):
+        while True:
+            message = self.message_buffer.get()
+            try:
+                self.faucet_executor.process_message(
+                    message, job_id=f"{message.source}:{message.id}"
+                )
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.warning("failed to process %s: %s", message, ex)
 
     def on_error(self, status_code):
         logging.error("event listener failed with code %s", status_code)
@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 from enum import Enum
+from typing import Callable, List
 
 
 @dataclass
@@ -16,3 +17,12 @@ class Status(Enum):
     INVALID = 1
     RATE_LIMITED = 2
     ERROR = 3
+
+
+@dataclass
+class Result:
+    status: Status
+    tx_hashes: List[str] = field(default_factory=list)
+
+
+ResultCallback = Callable[[Result], None]
@@ -0,0 +1,192 @@
+import functools
+import logging
+import threading
+import time
+from typing import List, Optional, Set, Tuple
+
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+from web3.main import Web3
+from web3.types import TxReceipt
+
+from social_faucet import settings
+from social_faucet.fee_oracle import FeeOracle
+from social_faucet.nonce_manager import NonceManager
+from social_faucet.receipt_tracker import ReceiptTracker
+
+
+class Signer:
+    def __init__(
+        self,
+        web3: Web3,
+        private_key: str,
+        nonce_manager: Optional[NonceManager] = None,
+    ):
+        self.web3 = web3
+        self.private_key = private_key
+        self.address = web3.eth.account.from_key(private_key).address
+        if nonce_manager is None:
+            nonce_manager = NonceManager(web3, self.address)
+        self.nonce_manager = nonce_manager
+        self.pending = 0
+        self.balance = 0
+
+    def sign_transaction(self, transaction: dict) -> HexBytes:
+        signed_tx = self.web3.eth.account.sign_transaction(
+            transaction, self.private_key
+        )
+        return signed_tx.rawTransaction
+
+    def __repr__(self):
+        return f"Signer({self.address})"
+
+
+class WalletPool:
+    def __init__(
+        self,
+        web3: Web3,
+        signers: List[Signer],
+        min_balance: int = settings.SHARD_MIN_BALANCE,
+        refresh_interval: float = settings.BALANCE_REFRESH_INTERVAL,
+    ):
+        if not signers:
+            raise ValueError("at least one signer is required")
+        self.web3 = web3
+        self.signers = signers
+        self.min_balance = min_balance
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_private_keys(cls, web3: Web3, private_keys: List[str], **kwargs):
+        return cls(web3, [Signer(web3, key) for key in private_keys], **kwargs)
+
+    def start(self):
+        for signer in self.signers:
+            signer.nonce_manager.sync()
+        self.refresh_balances()
+        if len(self.signers) > 1:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def acquire(self, address: Optional[str] = None) -> Signer:
+        with self._lock:
+            if address is not None:
+                signer = self.get(address)
+            else:
+                funded = [s for s in self.signers if s.balance >= self.min_balance]
+                signer = min(funded or self.signers, key=lambda s: s.pending)
+            signer.pending += 1
+            return signer
+
+    def release(self, signer: Signer):
+        with self._lock:
+            signer.pending -= 1
+
+    def get(self, address: str) -> Signer:
+        for signer in self.signers:
+            if signer.address.lower() == address.lower():
+                return signer
+        raise ValueError(f"no signer for {address} in the wallet pool")
+
+    def refresh_balances(self):
+        for signer in self.signers:
+            try:
+                signer.balance = self.web3.eth.get_balance(signer.address)  # type: ignore
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.warning("failed to fetch balance of %s: %s", signer, ex)
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh_balances()
+
+
+class WalletRebalancer:
+    def __init__(
+        self,
+        web3: Web3,
+        wallet_pool: WalletPool,
+        main_signer: Signer,
+        fee_oracle: FeeOracle,
+        receipt_tracker: ReceiptTracker,
+        min_balance: int = settings.SHARD_MIN_BALANCE,
+        top_up_value: int = settings.SHARD_TOP_UP_VALUE,
+        interval: float = settings.SHARD_REBALANCE_INTERVAL,
+    ):
+        self.web3 = web3
+        self.wallet_pool = wallet_pool
+        self.main_signer = main_signer
+        self.fee_oracle = fee_oracle
+        self.receipt_tracker = receipt_tracker
+        self.min_balance = min_balance
+        self.top_up_value = top_up_value
+        self.interval = interval
+        self._top_ups: Set[str] = set()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def rebalance(self):
+        self.wallet_pool.refresh_balances()
+        for signer in self.wallet_pool.signers:
+            if signer is self.main_signer or signer.balance >= self.min_balance:
+                continue
+            if signer.address in self._top_ups:
+                continue
+            try:
+                tx_hash, nonce = self._top_up(signer)
+            except Exception as ex:  # pylint: disable=broad-except
+                logging.warning("failed to top up %s: %s", signer, ex)
+                continue
+            self._top_ups.add(signer.address)
+            self.receipt_tracker.track(
+                tx_hash,
+                functools.partial(self._on_top_up_receipt, signer, tx_hash, nonce),
+            )
+
+    def _on_top_up_receipt(
+        self,
+        signer: Signer,
+        tx_hash: HexBytes,
+        nonce: int,
+        receipt: Optional[TxReceipt],
+    ):
+        self._top_ups.discard(signer.address)
+        if receipt is not None:
+            if receipt["status"] == 0:
+                logging.error("top up %s of %s failed", tx_hash.hex(), signer)
+            return
+        logging.error("top up %s of %s timed out", tx_hash.hex(), signer)
+        try:
+            self.web3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            logging.warning("top up %s was dropped", tx_hash.hex())
+            self.main_signer.nonce_manager.release(nonce)
+        except Exception as ex:  # pylint: disable=broad-except
+            logging.warning("could not check top up %s: %s", tx_hash.hex(), ex)
+
+    def _top_up(self, signer: Signer) -> Tuple[HexBytes, int]:
+        max_fee_per_gas, max_priority_fee_per_gas = self.fee_oracle.get_fees()
+        nonce = self.main_signer.nonce_manager.allocate()
+        transaction = {
+            "to": signer.address,
+            "value": self.top_up_value,
+            "gas": 21000,
+            "chainId": self.web3.eth.chain_id,
+            "nonce": nonce,
+            "maxFeePerGas": max_fee_per_gas,
+            "maxPriorityFeePerGas": max_priority_fee_per_gas,
+        }
+        try:
+            raw_tx = self.main_signer.sign_transaction(transaction)
+            tx_hash = self.web3.eth.send_raw_transaction(raw_tx)
+        except Exception as ex:
+            self.main_signer.nonce_manager.recover(nonce, ex)
+            raise
+        logging.info("topping up %s with %s: %s", signer, transaction, tx_hash.hex())
+        return tx_hash, nonce
+
+    def _run(self):
+        while True:
+            self.rebalance()
+            time.sleep(self.interval)